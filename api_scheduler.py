@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """リクエストの優先度（値が小さいほど優先）"""
+    INTERACTIVE = 0  # 画面操作による検索
+    PREFETCH = 1  # 周辺タイルの先読み
+    BULK = 2  # 一括ダウンロード
+
+
+@dataclass
+class _Request:
+    """キューに積まれたリクエスト"""
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    priority: Priority
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RequestScheduler:
+    """優先度付きキューと共有のレート制限でAPIリクエストを実行するクラス
+
+    レート制限のトークンを取得できた時点で最も優先度の高いリクエストを実行する。
+    ただし待ち時間が上限を超えた下位のリクエストは優先度に関係なく先に実行し、
+    一括ダウンロードや先読みが完全に止まらないようにする。
+    """
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        workers: int,
+        max_wait: Dict[Priority, float],
+    ):
+        """
+        Args:
+            rate_limiter: リクエスト頻度を制限するレートリミッタ
+            workers: リクエストを実行するスレッド数
+            max_wait: 優先度ごとの待ち時間の上限（秒）。超えたリクエストは優先的に実行
+        """
+        self.rate_limiter = rate_limiter
+        self.max_wait = max_wait
+        self._queues = {priority: deque() for priority in Priority}
+        self._wait_times = {priority: deque(maxlen=1000) for priority in Priority}
+        self._completed = {priority: 0 for priority in Priority}
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="api-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, priority: Priority, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """リクエストをキューに追加
+
+        Returns:
+            Future: 実行結果を受け取るFuture（未実行であればキャンセル可能）
+        """
+        request = _Request(fn, args, kwargs, priority)
+        with self._condition:
+            self._queues[priority].append(request)
+            self._condition.notify()
+        return request.future
+
+    def _next_request(self) -> Optional[_Request]:
+        """次に実行するリクエストを取り出す（ロック取得済みの状態で呼び出す）"""
+        now = time.monotonic()
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        if not heads:
+            return None
+        starving = [
+            request for request in heads
+            if now - request.enqueued_at >= self.max_wait.get(request.priority, float("inf"))
+        ]
+        if starving:
+            request = min(starving, key=lambda r: r.enqueued_at)
+        else:
+            request = min(heads, key=lambda r: r.priority)
+        return self._queues[request.priority].popleft()
+
+    def _dispatch(self) -> None:
+        """トークンを取得するたびに最も優先すべきリクエストを実行スレッドへ渡す"""
+        while True:
+            with self._condition:
+                while not any(self._queues.values()):
+                    self._condition.wait()
+            self.rate_limiter.acquire()
+
+            while True:
+                with self._condition:
+                    request = self._next_request()
+                # キャンセル済みのリクエストにはトークンを使わない
+                if request is None or request.future.set_running_or_notify_cancel():
+                    break
+            if request is None:
+                continue
+
+            with self._condition:
+                self._wait_times[request.priority].append(time.monotonic() - request.enqueued_at)
+            self._executor.submit(self._execute, request)
+
+    def _execute(self, request: _Request) -> None:
+        """リクエストを実行して結果をFutureに設定"""
+        try:
+            request.future.set_result(request.fn(*request.args, **request.kwargs))
+        except BaseException as e:
+            request.future.set_exception(e)
+        finally:
+            with self._condition:
+                self._completed[request.priority] += 1
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """優先度ごとのキュー長・完了数・待ち時間（秒）を取得"""
+        with self._condition:
+            result = {}
+            for priority in Priority:
+                wait_times = np.array(self._wait_times[priority])
+                result[priority.name] = {
+                    "queue_depth": len(self._queues[priority]),
+                    "completed": self._completed[priority],
+                    "wait_avg": float(wait_times.mean()) if wait_times.size else 0.0,
+                    "wait_p95": float(np.percentile(wait_times, 95)) if wait_times.size else 0.0,
+                    "wait_max": float(wait_times.max()) if wait_times.size else 0.0,
+                }
+            return result
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(config) -> RequestScheduler:
+    """プロセス全体で共有するリクエストスケジューラを取得
+
+    Args:
+        config: レート制限・スレッド数・待ち時間上限を持つDataConfig
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                RateLimiter(config.API_RATE_LIMIT, config.API_RATE_BURST),
+                workers=config.MAX_FETCH_WORKERS,
+                max_wait={
+                    Priority.PREFETCH: config.PREFETCH_MAX_WAIT,
+                    Priority.BULK: config.BULK_MAX_WAIT,
+                },
+            )
+            logger.info("API request scheduler started")
+        return _scheduler
@@ -2,6 +2,7 @@ import streamlit as st
 
 from data_analysis import DataAnalyzer
 from geo_estate_analyzer import GeoEstateAnalyzer
+from property_valuation import ValuationAnalyzer
 from real_estate_search import SearchAnalyzer
 
 
@@ -15,7 +16,8 @@ def main():
         "トップページ": home_page,
         "データ検索": lambda: SearchAnalyzer().run(),
         "データ分析": lambda: DataAnalyzer().run(),
-        "位置情報によるデータ分析": lambda: GeoEstateAnalyzer().run()
+        "位置情報によるデータ分析": lambda: GeoEstateAnalyzer().run(),
+        "物件価格の推定": lambda: ValuationAnalyzer().run()
     }
 
     page = st.sidebar.radio("ページ選択", list(pages.keys()))
@@ -1,31 +1,80 @@
-from pathlib import Path
 from typing import Optional
 
 import duckdb
 import streamlit as st
 
+from data_store import DATA_FILE, DataStore, get_data_store
+from dependency_graph import DependencyGraph, get_dependency_graph
+from query_runner import get_query_runner
+from result_cache import get_result_cache, relation_fingerprint
+
 
 class BaseAnalyzer:
     """不動産分析の基底クラス"""
     
     def __init__(self):
-        self.data_file = Path(__file__).parent / "data" / "data.parquet"
+        self.data_file = DATA_FILE
+        # この実行で実行したクエリ数とキャッシュから取得した結果の数
+        self.query_counts = {"executed": 0, "cached": 0}
         self._initialize_session_state()
     
     def _initialize_session_state(self) -> None:
         """セッション状態の初期化（サブクラスでオーバーライド）"""
         pass
     
-    def _load_data(self) -> Optional[duckdb.DuckDBPyRelation]:
-        """データの読み込み"""
+    def _load_data(self, table_name: str = DataStore.TABLE_NAME) -> Optional[duckdb.DuckDBPyRelation]:
+        """データの読み込み（table_nameで派生テーブルを指定可能）"""
         try:
-            return duckdb.sql(f"SELECT * FROM '{self.data_file}'")
+            return get_data_store().relation(table_name)
         except FileNotFoundError:
             st.error(f"{self.data_file} が見つかりません。ファイルパスを確認してください。")
         except Exception as e:
             st.error(f"データ読み込み中にエラーが発生しました: {e}")
         return None
     
+    def _fetch_df(self, rel: duckdb.DuckDBPyRelation, slot: str):
+        """relationの結果を中断可能なワーカースレッドで取得
+
+        同じ用途（slot）のクエリが実行中であれば、入力が変わったものとして中断する。
+        """
+        self.query_counts["executed"] += 1
+        return get_query_runner().fetch_df(f"{type(self).__name__}.{slot}", rel)
+
+    def _fetch_cached_df(self, rel: duckdb.DuckDBPyRelation, slot: str):
+        """relationの結果をセッション間で共有するキャッシュ経由で取得
+
+        キーはslot（用途とカラム）とrelationのフィンガープリントで、データのバージョンが
+        変わるとキャッシュ全体が破棄される。フィルタの異なるrelationは別の結果として扱う。
+        結果のDataFrameは共有されるため、呼び出し元で変更しないこと。
+        """
+        executed_before = self.query_counts["executed"]
+        result = get_result_cache().get_or_compute(
+            (slot, relation_fingerprint(rel)),
+            get_data_store().version,
+            lambda: self._fetch_df(rel, slot),
+        )
+        if self.query_counts["executed"] == executed_before:
+            self.query_counts["cached"] += 1
+        return result
+
+    @property
+    def graph(self) -> DependencyGraph:
+        """このページの派生結果の依存グラフ（セッションごと）"""
+        return get_dependency_graph(type(self).__name__)
+
+    def _evaluate(self, name: str, inputs, compute):
+        """依存する入力（ウィジェットの値・データのバージョン）が変わった場合だけ結果を再計算"""
+        return self.graph.evaluate(name, inputs, compute, data_version=get_data_store().version)
+
+    def _render_query_counts(self) -> None:
+        """この実行で実行したクエリ数（データの走査回数）と再計算した結果を表示"""
+        st.caption(
+            f"集計クエリ: {self.query_counts['executed']}回実行"
+            f"（キャッシュから取得: {self.query_counts['cached']}件）"
+            f" / 再計算: {', '.join(self.graph.recomputed) or 'なし'}"
+            f" / 前回の結果を再利用: {', '.join(self.graph.reused) or 'なし'}"
+        )
+
     def run(self) -> None:
         """アプリケーションのメイン実行部分（サブクラスでオーバーライド）"""
         pass 
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""価格指数の計算性能を全国規模の合成データで計測するスクリプト
+
+使い方:
+    python benchmark_price_index.py --districts 50000 --quarters 60
+"""
+import argparse
+import time
+
+import duckdb
+
+from price_index import SMOOTHING_QUARTERS, price_index_sql
+
+
+def create_district_quarter_stats(
+    connection: duckdb.DuckDBPyConnection, districts: int, quarters: int, missing_ratio: float
+) -> int:
+    """district_quarter_statsと同じ形の合成データを作成して行数を返す"""
+    connection.execute(
+        f"""
+        CREATE OR REPLACE TABLE district_quarter_stats AS
+        SELECT
+            'municipality_' || (district // 30) AS Municipality,
+            'district_' || district AS DistrictName,
+            (DATE '2010-01-01' + INTERVAL (q * 3 + 3) MONTH - INTERVAL 1 DAY)::TIMESTAMP_NS AS Period,
+            (1 + floor(random() * 20))::BIGINT AS count,
+            500000 + random() * 1000000 AS median_price_per_area
+        FROM range({districts}) AS d(district), range({quarters}) AS t(q)
+        WHERE random() >= {missing_ratio}
+        """
+    )
+    return connection.execute("SELECT COUNT(*) FROM district_quarter_stats").fetchone()[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--districts", type=int, default=50000, help="地区数")
+    parser.add_argument("--quarters", type=int, default=60, help="四半期数")
+    parser.add_argument("--missing-ratio", type=float, default=0.2, help="取引のない四半期の割合")
+    parser.add_argument("--window", type=int, default=SMOOTHING_QUARTERS, help="平滑化する四半期数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数")
+    args = parser.parse_args()
+
+    with duckdb.connect(":memory:") as connection:
+        rows = create_district_quarter_stats(connection, args.districts, args.quarters, args.missing_ratio)
+        print(f"district × quarter rows: {rows:,}")
+
+        sql = price_index_sql("SELECT * FROM district_quarter_stats", args.window)
+        for i in range(args.repeat):
+            started_at = time.perf_counter()
+            result = connection.execute(sql).fetch_arrow_table()
+            seconds = time.perf_counter() - started_at
+            print(
+                f"run {i + 1}: {seconds:.3f}s "
+                f"({rows / seconds:,.0f} rows/s, {result.num_rows:,} index rows)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import logging
+from datetime import date
+from math import ceil, floor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from data_store import DATA_FILE, file_version
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_path(data_file: Path = DATA_FILE) -> Path:
+    """データファイルに対応するカタログファイルのパスを取得"""
+    return data_file.with_name("catalog.json")
+
+
+def build_catalog(df: pd.DataFrame, data_version: Optional[str]) -> Dict[str, Any]:
+    """データの選択肢と範囲をまとめたカタログを作成
+
+    文字列カラムは重複を除いた値の一覧、数値・日時カラムは最小値と最大値を保持する。
+
+    Args:
+        df: 整形済みのデータ
+        data_version: カタログを作成したデータのバージョン
+
+    Returns:
+        Dict[str, Any]: カタログ
+    """
+    catalog = {"data_version": data_version, "categorical": {}, "numeric": {}, "datetime": {}}
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            if series.notna().any():
+                catalog["datetime"][column] = [
+                    series.min().date().isoformat(),
+                    series.max().date().isoformat(),
+                ]
+        elif pd.api.types.is_numeric_dtype(series):
+            if series.notna().any():
+                catalog["numeric"][column] = [float(series.min()), float(series.max())]
+        else:
+            catalog["categorical"][column] = sorted(series.dropna().astype(str).unique().tolist())
+    return catalog
+
+
+def save_catalog(catalog: Dict[str, Any], data_file: Path = DATA_FILE) -> None:
+    """カタログをデータファイルと同じディレクトリに保存"""
+    path = catalog_path(data_file)
+    path.write_text(json.dumps(catalog, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"Catalog saved to {path}")
+
+
+@st.cache_resource(max_entries=1)
+def _load_catalog(data_version: Optional[str]) -> Dict[str, Any]:
+    """カタログを読み込み（データと一致しない場合は作り直す）"""
+    try:
+        catalog = json.loads(catalog_path().read_text(encoding="utf-8"))
+        if catalog.get("data_version") == data_version:
+            return catalog
+    except (OSError, ValueError):
+        pass
+
+    logger.info("Catalog is missing or outdated. Rebuilding from data file")
+    catalog = build_catalog(pd.read_parquet(DATA_FILE), data_version)
+    save_catalog(catalog)
+    return catalog
+
+
+def get_catalog() -> Dict[str, Any]:
+    """現在のデータに対応するカタログを取得"""
+    return _load_catalog(file_version(DATA_FILE))
+
+
+def options(column: str) -> List[str]:
+    """カラムの選択肢を取得"""
+    return get_catalog()["categorical"].get(column, [])
+
+
+def slider_bounds(column: str) -> Tuple[int, int]:
+    """スライダーで使用するカラムの範囲（整数に丸めた最小値・最大値）を取得"""
+    minimum, maximum = get_catalog()["numeric"].get(column, (0, 0))
+    return floor(minimum), ceil(maximum)
+
+
+def date_bounds(column: str) -> Tuple[date, date]:
+    """日時カラムの範囲（日付の最小値・最大値）を取得"""
+    minimum, maximum = get_catalog()["datetime"][column]
+    return date.fromisoformat(minimum), date.fromisoformat(maximum)
@@ -2,6 +2,8 @@ from datetime import datetime
 
 import streamlit as st
 
+from district_index import get_district_index
+
 
 def render_location_inputs(session_state):
     """緯度経度入力コンポーネントを表示"""
@@ -57,6 +59,17 @@ def render_control_panel():
     
     return zoom_level, selected_range
 
+def render_search_area_selector(options, current):
+    """検索範囲の指定方法を選択するコンポーネントを表示"""
+    return st.radio(
+        "検索範囲",
+        options=options,
+        index=options.index(current) if current in options else 0,
+        horizontal=True,
+        help="ポリゴンを選択した場合は地図左上のツールで範囲を描画してください",
+        key="search_area_radio"
+    )
+
 def render_action_buttons():
     """アクションボタンの表示"""
     col1, col2 = st.columns(2)
@@ -64,4 +77,15 @@ def render_action_buttons():
         clear_data = st.button("データをクリア", type="secondary")
     with col2:
         search = st.button("物件を検索", type="primary")
-    return clear_data, search 
\ No newline at end of file
+    return clear_data, search 
+
+def render_district_search(key):
+    """地区名・市区町村名のあいまい検索欄を表示し、一致した地区名を返す（未入力時はNone）"""
+    query = st.text_input(
+        "地区名・市区町村名で検索",
+        key=key,
+        help="前方一致・あいまい一致で地区の選択肢を絞り込みます（例：日本橋、浅草、台東区）",
+    )
+    if not query:
+        return None
+    return get_district_index().search_districts(query)
@@ -4,6 +4,15 @@ import plotly.express as px
 import streamlit as st
 
 from base_analyzer import BaseAnalyzer
+from components.ui_components import render_district_search
+from data_store import get_data_store
+from outlier_scoring import OUTLIER_THRESHOLD
+from period_comparison import COMPARISON_LAGS, COMPARISON_METRICS, period_comparison_relation
+from price_index import SMOOTHING_QUARTERS, price_index_relation
+from query_batch import BatchResult, QueryBatch
+from quantile_cube import APPROX_RANK_ERROR, CONFIDENCE, SAMPLE_SIZE, box_figure, box_summary_relation
+from stratified_sample import stratified_sample_relation
+from time_rollups import RESOLUTIONS, SKETCH_RELATIVE_ERROR, rollup_summary_relation
 
 # 定数
 DEFAULT_DISTRICTS = [
@@ -302,31 +311,42 @@ class DataAnalyzer(BaseAnalyzer):
         "神田猿楽町", "神田東松下町", "神田東紺屋町", "神田鍛冶町",
         "神田美土代町",
     ]
-    LIMIT_ROWS = 10000  # データ抽出時の行数制限
-
-    def _filter_used_mansions(self, rel):
-        """中古マンションのみにフィルタリング"""
-        if "Type" in rel.columns:
-            return rel.filter("Type = '中古マンション等'")
-        st.info("データに 'Type'(種類) カラムが見つかりません。")
-        return rel
-
-    def _compute_tradeprice_per_area(self, rel):
-        """面積当たりの取引価格を計算"""
-        if "TradePrice" in rel.columns and "Area" in rel.columns:
-            return rel.project("*, TradePrice / Area as TradePricePerArea")
-        st.info("取引価格(TradePrice)または面積(Area)のカラムが見つかりません。")
-        return rel
-
-    def _get_sorted_unique_values(self, rel, column) -> list:
-        """指定されたカラムからユニークな値をソート済みで取得"""
-        try:
+    SCATTER_MAX_ROWS = 5000  # 散布図としてブラウザに送る取引の件数の上限
+    SCATTER_MAX_PER_STRATUM = 50  # 散布図で1つの地区・四半期から抽出する取引の件数の上限
+    # 価格指数チャートの表示モード（表示名: カラム）
+    PRICE_INDEX_MODES = {
+        "価格指数（最初の四半期=100）": "price_index",
+        "平滑化した面積単価": "smoothed_price",
+        "面積単価の中央値": "median_price",
+        "前期比": "qoq_change",
+    }
+
+    def _run_batch(self, batch: QueryBatch, slot: str) -> BatchResult:
+        """まとめた集計を1回の走査で実行して結果を取得（データのバージョンごとにキャッシュ）"""
+        return batch.result(self._fetch_cached_df(batch.relation(), slot))
+
+    def _load_lookups(self, rel, district_stats):
+        """ページ全体で使う件数・選択肢をテーブルごとに1回の走査でまとめて取得
+
+        Returns:
+            Tuple[BatchResult, BatchResult]: 地区・四半期集計（市区町村・地区ごとの件数と全体の件数・外れ値の件数）と
+                中古マンション等の行（間取り・建物構造の選択肢）の集計結果
+        """
+        district_batch = (
+            QueryBatch(district_stats)
+            .add_group("Municipality", "DistrictName")
+            .add_aggregate("transactions", "SUM(count)::BIGINT")
+            .add_aggregate("municipalities", "COUNT(DISTINCT Municipality)")
+            .add_aggregate("outliers", "SUM(outlier_count)::BIGINT")
+        )
+        option_batch = QueryBatch(rel)
+        for column in ("FloorPlan", "Structure"):
             if column in rel.columns:
-                unique_df = rel.project(column).distinct().order(column).df()
-                return unique_df[column].tolist()
-        except Exception as e:
-            st.error(f"Error retrieving unique values for {column}: {e}")
-        return []
+                option_batch.add_group(column)
+        return (
+            self._run_batch(district_batch, "district_lookups"),
+            self._run_batch(option_batch, "option_lookups"),
+        )
 
     def _apply_in_filter(self, rel, column, values):
         """INフィルタの適用"""
@@ -336,8 +356,8 @@ class DataAnalyzer(BaseAnalyzer):
         return rel
 
     def _render_treemap_chart(self, df):
-        """Treemapチャートの描画"""
-        fig_treemap = px.treemap(df, path=["Municipality", "DistrictName"], title="件数")
+        """Treemapチャートの描画（集計済みの件数を面積に使用）"""
+        fig_treemap = px.treemap(df, path=["Municipality", "DistrictName"], values="件数", title="件数")
         st.plotly_chart(fig_treemap)
 
     def _render_bar_chart(self, df):
@@ -345,84 +365,175 @@ class DataAnalyzer(BaseAnalyzer):
         fig_bar = px.bar(df, x="地区名", y="件数", title="地区ごとの件数")
         st.plotly_chart(fig_bar)
 
-    def _plot_district_count_charts(self, rel):
-        """地区ごとの件数をTreemapと棒グラフで表示"""
+    def _plot_district_count_charts(self, counts_df):
+        """地区ごとの件数をTreemapと棒グラフで表示
+
+        Args:
+            counts_df: 市区町村・地区ごとの件数（Municipality, DistrictName, 件数）
+        """
         st.subheader("地区ごとの件数")
         st.markdown("### 表示するチャートを選択してください")
         col1, col2 = st.columns(2)
         treemap_selected = col1.checkbox("Treemap", value=True)
         bar_selected = col2.checkbox("棒グラフ", value=True)
 
+        # Treemapと棒グラフは同じ集計結果から描画する
         if treemap_selected:
-            if "Municipality" in rel.columns and "DistrictName" in rel.columns:
-                st.subheader("市区町村・地区ごとの件数")
-                treemap_df = rel.df()
-                self._render_treemap_chart(treemap_df)
-            else:
-                st.info("データに 'Municipality' または 'DistrictName' カラムが見つかりません。")
+            st.subheader("市区町村・地区ごとの件数")
+            self._render_treemap_chart(counts_df)
 
         if bar_selected:
-            if "DistrictName" in rel.columns:
-                st.subheader("地区ごとの件数")
-                district_counts_rel = rel.aggregate(
-                    "COUNT(*) AS 件数, DistrictName AS 地区名", "DistrictName"
-                ).order("件数 DESC")
-                district_counts_df = district_counts_rel.df()
-                self._render_bar_chart(district_counts_df)
-            else:
-                st.info("データに 'DistrictName' カラムが見つかりません。")
-
-    def _plot_tradeprice_area_charts(self, rel):
-        """取引価格の分析チャートを表示"""
+            st.subheader("地区ごとの件数")
+            district_counts_df = (
+                counts_df.groupby("DistrictName", as_index=False, dropna=False)["件数"].sum()
+                .rename(columns={"DistrictName": "地区名"})
+                .sort_values("件数", ascending=False)
+            )
+            self._render_bar_chart(district_counts_df)
+
+    def _select_districts(self, options):
+        """地区名検索で選択肢を絞り込める地区の複数選択を表示"""
+        key = "analysis_selected_districts"
+        if key not in st.session_state:
+            st.session_state[key] = list(dict.fromkeys(self.DEFAULT_DISTRICTS))
+        selected = [district for district in st.session_state[key] if district in options]
+
+        candidates = render_district_search("analysis_district_query")
+        if candidates is not None:
+            allowed = set(candidates) | set(selected)
+            options = [district for district in options if district in allowed]
+
+        # 選択肢が変わってもウィジェットの選択状態が失われないよう引き継ぐ
+        st.session_state[key] = selected
+        return st.multiselect("地区を選択してください", options=options, key=key)
+
+    def _plot_tradeprice_area_charts(self, rel, unique_districts, option_lookups, exclude_outliers=False):
+        """取引価格の分析チャートを表示
+
+        Args:
+            rel: 中古マンション等の行（used_mansions）
+            unique_districts: 地区の一覧
+            option_lookups: 間取り・建物構造の選択肢をまとめて集計した結果
+            exclude_outliers: 取り込み時に外れ値と判定された取引を除外するかどうか
+        """
         if "DistrictName" not in rel.columns or "TradePricePerArea" not in rel.columns:
             st.info("データに 'DistrictName' または 'TradePricePerArea' カラムが見つかりません。")
             return
 
         st.subheader("面積当たりの取引価格")
-        unique_districts = self._get_sorted_unique_values(rel, "DistrictName")
-        selected_districts = st.multiselect(
-            "地区を選択してください",
-            options=unique_districts if unique_districts else self.DEFAULT_DISTRICTS,
-            default=self.DEFAULT_DISTRICTS,
+        selected_districts = self._select_districts(
+            unique_districts if unique_districts else self.DEFAULT_DISTRICTS
         )
         if not selected_districts:
             st.info("少なくとも1つの地区を選択してください。")
             return
 
         filtered_rel = self._apply_in_filter(rel, "DistrictName", selected_districts)
+        # 絞り込み条件（これに依存する結果は条件が変わったときだけ再計算する）
+        filters = {
+            "districts": tuple(selected_districts),
+            "floor_plans": None,
+            "structures": None,
+            "exclude_outliers": exclude_outliers,
+        }
+        if exclude_outliers:
+            # 外れ値の判定は取り込み時に済んでいるため、除外は絞り込み条件の追加だけで済む
+            filtered_rel = filtered_rel.filter("NOT IsOutlier")
 
         if "FloorPlan" in rel.columns:
-            unique_floorplans = self._get_sorted_unique_values(rel, "FloorPlan")
+            unique_floorplans = option_lookups.distinct("FloorPlan")
             selected_floorplans = st.multiselect(
                 "間取りを選択してください",
                 options=unique_floorplans,
                 default=unique_floorplans,
             )
             filtered_rel = self._apply_in_filter(filtered_rel, "FloorPlan", selected_floorplans)
+            filters["floor_plans"] = tuple(selected_floorplans)
 
         if "Structure" in rel.columns:
-            unique_structures = self._get_sorted_unique_values(rel, "Structure")
+            unique_structures = option_lookups.distinct("Structure")
             selected_structures = st.multiselect(
                 "建物構造を選択してください",
                 options=unique_structures,
                 default=unique_structures,
             )
             filtered_rel = self._apply_in_filter(filtered_rel, "Structure", selected_structures)
+            filters["structures"] = tuple(selected_structures)
+
+        approximate = st.toggle(
+            "近似モード",
+            help=(
+                f"件数が{SAMPLE_SIZE:,}件を超えるグループの四分位数を標本から近似します"
+                f"（順位誤差 ±{APPROX_RANK_ERROR:.1%}以内、信頼度{CONFIDENCE:.0%}）。"
+                "件数の少ないグループは常に厳密に計算します。"
+            ),
+        )
 
         st.write("【箱ひげ図】")
-        self._draw_tradeprice_box_chart(filtered_rel)
+        self._draw_tradeprice_box_chart(filtered_rel, filters, approximate)
 
         st.write("【時系列箱ひげ図】")
-        self._draw_tradeprice_time_series_chart(filtered_rel, selected_districts)
+        self._draw_tradeprice_time_series_chart(filtered_rel, filters, selected_districts, approximate)
+
+        st.write("【面積と面積単価の散布図】")
+        self._draw_tradeprice_scatter_chart(filtered_rel, filters)
+
+    def _draw_tradeprice_scatter_chart(self, filtered_rel, filters):
+        """フィルタ済みrelationから面積と面積単価の散布図を描画
+
+        取引を1件ずつ描画するため、先頭から打ち切らずに地区・四半期ごとの層別抽出でSCATTER_MAX_ROWS件までに抑える。
+        """
+        columns = ["DistrictName", "Area", "TradePricePerArea", "TradePrice", "Period"]
+        if "FloorPlan" in filtered_rel.columns:
+            columns.append("FloorPlan")
+        scatter_df = self._evaluate(
+            "scatter",
+            filters,
+            lambda: self._fetch_df(
+                stratified_sample_relation(
+                    filtered_rel.project(", ".join(columns)),
+                    ["DistrictName", "Period"],
+                    self.SCATTER_MAX_ROWS,
+                    max_per_stratum=self.SCATTER_MAX_PER_STRATUM,
+                ),
+                "scatter",
+            ),
+        )
+        if scatter_df.empty:
+            st.info("表示するデータがありません。")
+            return
 
-    def _draw_tradeprice_box_chart(self, filtered_rel):
+        fig_scatter = px.scatter(
+            scatter_df,
+            x="Area",
+            y="TradePricePerArea",
+            color="DistrictName",
+            hover_data=[column for column in columns if column not in ("Area", "TradePricePerArea")],
+            opacity=0.6,
+            title="面積と面積当たりの取引価格",
+        )
+        st.plotly_chart(fig_scatter)
+        # 各行の重み（抽出率の逆数）の合計は抽出元の件数（層を間引いた場合はその推定値）になる
+        total_rows = int(round(scatter_df["sample_weight"].sum()))
+        if len(scatter_df) < total_rows:
+            st.caption(
+                f"約{total_rows:,}件から地区・四半期ごとに偏りなく{len(scatter_df):,}件を抽出して表示しています。"
+            )
+
+    def _draw_tradeprice_box_chart(self, filtered_rel, filters, approximate=False):
         """フィルタ済みrelationから箱ひげ図（TradePricePerAreaの分布）を描画"""
         rel_to_plot = filtered_rel
+        selected_period_range = None
         if "Period" in filtered_rel.columns:
             # 集約クエリを使用して、Periodの範囲を効率的に取得する
-            period_range_df = filtered_rel.aggregate(
-                "MIN(Period) as min_period, MAX(Period) as max_period"
-            ).df()
+            period_range_df = self._evaluate(
+                "period_range",
+                filters,
+                lambda: self._fetch_cached_df(
+                    filtered_rel.aggregate("MIN(Period) as min_period, MAX(Period) as max_period"),
+                    "period_range",
+                ),
+            )
             min_period = period_range_df["min_period"].iloc[0]
             max_period = period_range_df["max_period"].iloc[0]
             try:
@@ -443,10 +554,8 @@ class DataAnalyzer(BaseAnalyzer):
                 f"Period >= '{selected_period_range[0]}' AND Period <= '{selected_period_range[1]}'"
             )
 
-        box_df = rel_to_plot.limit(self.LIMIT_ROWS).df()
-
         group_by_options = ["DistrictName"]
-        if "Period" in box_df.columns:
+        if "Period" in rel_to_plot.columns:
             group_by_options.append("Period")
 
         selected_group_by = st.radio(
@@ -455,15 +564,32 @@ class DataAnalyzer(BaseAnalyzer):
             index=0,
         )
 
-        fig_box = px.box(
+        # 四分位数などはDuckDBで全件から集計し、グループごとの統計量だけを描画する
+        box_inputs = {
+            **filters,
+            "period_range": selected_period_range,
+            "group_by": selected_group_by,
+            "approximate": approximate,
+        }
+        box_df = self._evaluate(
+            "box",
+            box_inputs,
+            lambda: self._fetch_df(
+                box_summary_relation(
+                    rel_to_plot, [selected_group_by], "TradePricePerArea", approximate=approximate
+                ),
+                "box",
+            ),
+        )
+        fig_box = box_figure(
             box_df,
-            y="TradePricePerArea",
-            x=selected_group_by,
+            x_column=selected_group_by,
             title=f"{selected_group_by}ごとの面積当たりの取引価格分布",
+            y_title="TradePricePerArea",
         )
         st.plotly_chart(fig_box)
 
-    def _draw_tradeprice_time_series_chart(self, filtered_rel, available_districts):
+    def _draw_tradeprice_time_series_chart(self, filtered_rel, filters, available_districts, approximate=False):
         """フィルタ済みrelationから時系列の箱ひげ図を描画"""
         if "Period" not in filtered_rel.columns:
             st.info("データに 'Period' カラムが見つかりません。")
@@ -478,15 +604,28 @@ class DataAnalyzer(BaseAnalyzer):
             default=["日本橋横山町", "東日本橋"],
         )
         ts_rel = self._apply_in_filter(filtered_rel, "DistrictName", selected_line_districts)
-        ts_rel = ts_rel.order("Period")
-        line_df = ts_rel.limit(self.LIMIT_ROWS).df()
+        ts_inputs = {
+            **filters,
+            "line_districts": tuple(selected_line_districts),
+            "approximate": approximate,
+        }
+        line_df = self._evaluate(
+            "time_series",
+            ts_inputs,
+            lambda: self._fetch_df(
+                box_summary_relation(
+                    ts_rel, ["DistrictName", "Period"], "TradePricePerArea", approximate=approximate
+                ),
+                "time_series",
+            ),
+        )
         if not line_df.empty:
-            fig_time_series = px.box(
+            fig_time_series = box_figure(
                 line_df,
-                x="Period",
-                y="TradePricePerArea",
-                color="DistrictName",
+                x_column="Period",
+                color_column="DistrictName",
                 title=f"地区ごとの面積当たりの取引価格の時系列分布 ({', '.join(selected_line_districts)})",
+                y_title="TradePricePerArea",
             )
             st.plotly_chart(fig_time_series)
         else:
@@ -494,20 +633,209 @@ class DataAnalyzer(BaseAnalyzer):
                 f"選択された地区({', '.join(selected_line_districts)})のデータがありません。"
             )
 
+    def _plot_price_index_chart(self, district_stats, unique_districts):
+        """地区別の四半期価格指数を表示
+
+        Args:
+            district_stats: 地区・四半期ごとの集計テーブル（district_quarter_stats）
+            unique_districts: 地区の一覧
+        """
+        st.subheader("地区別の四半期価格指数")
+        selected_districts = st.multiselect(
+            "価格指数を表示する地区を選択してください",
+            options=unique_districts,
+            default=[district for district in ["日本橋横山町", "東日本橋"] if district in unique_districts],
+        )
+        col_mode, col_window = st.columns(2)
+        mode_label = col_mode.radio("表示する値", options=list(self.PRICE_INDEX_MODES))
+        window = col_window.slider(
+            "平滑化する四半期数", min_value=1, max_value=8, value=SMOOTHING_QUARTERS
+        )
+        if not selected_districts:
+            st.info("少なくとも1つの地区を選択してください。")
+            return
+
+        # 全地区の系列を一度に計算してキャッシュし、表示する地区だけを取り出す
+        index_df = self._evaluate(
+            "price_index",
+            {"window": window},
+            lambda: self._fetch_cached_df(
+                price_index_relation(district_stats, window), f"price_index_{window}"
+            ),
+        )
+        value_column = self.PRICE_INDEX_MODES[mode_label]
+        plot_df = index_df[index_df["DistrictName"].isin(selected_districts)].sort_values("Period")
+        fig_index = px.line(
+            plot_df,
+            x="Period",
+            y=value_column,
+            color="DistrictName",
+            markers=True,
+            hover_data=["volume"],
+            title=f"地区ごとの{mode_label}",
+        )
+        st.plotly_chart(fig_index)
+
+    def _render_period_comparison(self, district_stats, exclude_outliers=False):
+        """地区ごとの前期比・前年同期比の表を表示
+
+        Args:
+            district_stats: 地区・四半期ごとの集計テーブル（district_quarter_stats）
+            exclude_outliers: 外れ値を除いた件数・中央値で比較するかどうか
+        """
+        st.subheader("地区別の前期比・前年同期比")
+        # 全地区・全四半期の比較を一度に計算してキャッシュし、表示する四半期だけを取り出す
+        variant = "inliers" if exclude_outliers else "all"
+        comparison_df = self._evaluate(
+            "period_comparison",
+            {"exclude_outliers": exclude_outliers},
+            lambda: self._fetch_cached_df(
+                period_comparison_relation(district_stats, exclude_outliers), f"period_comparison_{variant}"
+            ),
+        )
+        if comparison_df.empty:
+            st.info("比較するデータがありません。")
+            return
+
+        col_period, col_lag = st.columns(2)
+        periods = sorted(comparison_df["Period"].unique(), reverse=True)
+        selected_period = col_period.selectbox(
+            "四半期を選択してください",
+            options=periods,
+            format_func=lambda period: f"{pd.Timestamp(period).year}Q{pd.Timestamp(period).quarter}",
+        )
+        lag = col_lag.radio(
+            "比較する期間",
+            options=list(COMPARISON_LAGS),
+            index=list(COMPARISON_LAGS).index("yoy"),
+            format_func=lambda key: COMPARISON_LAGS[key][1],
+            horizontal=True,
+        )
+
+        period_df = comparison_df[comparison_df["Period"] == selected_period]
+        lag_label = COMPARISON_LAGS[lag][1]
+        table = period_df[["Municipality", "DistrictName"]].rename(
+            columns={"Municipality": "市区町村", "DistrictName": "地区"}
+        )
+        for metric, metric_label in COMPARISON_METRICS.items():
+            table[metric_label] = period_df[metric]
+            table[f"{metric_label}（比較元）"] = period_df[f"{metric}_{lag}"]
+            table[f"{metric_label}の{lag_label}（%）"] = (period_df[f"{metric}_{lag}_change"] * 100).round(1)
+        sort_column = f"{COMPARISON_METRICS['unit_price']}の{lag_label}（%）"
+        st.dataframe(
+            table.sort_values(sort_column, ascending=False, na_position="last"),
+            hide_index=True,
+            use_container_width=True,
+        )
+        if exclude_outliers:
+            st.caption("外れ値を除いた取引の件数・中央値で比較しています。比較元の四半期に取引がない地区の値は空欄です。")
+        else:
+            st.caption("外れ値を含むすべての取引で比較しています。比較元の四半期に取引がない地区の値は空欄です。")
+
+    def _plot_rollup_chart(self, municipalities, unique_districts, exclude_outliers=False):
+        """期間別集計から選択した時間解像度の面積単価の推移を表示
+
+        Args:
+            municipalities: 市区町村の一覧
+            unique_districts: 地区の一覧
+            exclude_outliers: 外れ値を除外した集計を表示するかどうか
+        """
+        st.subheader("期間別の面積単価の推移")
+        col_resolution, col_level = st.columns(2)
+        resolution = col_resolution.radio(
+            "集計期間",
+            options=list(RESOLUTIONS),
+            format_func=lambda key: RESOLUTIONS[key].label,
+            horizontal=True,
+        )
+        level = col_level.radio("集計単位", options=["市区町村", "地区"], horizontal=True)
+        if level == "市区町村":
+            selected_names = st.multiselect(
+                "推移を表示する市区町村を選択してください", options=municipalities, default=municipalities
+            )
+        else:
+            selected_names = st.multiselect(
+                "推移を表示する地区を選択してください",
+                options=unique_districts,
+                default=[district for district in ["日本橋横山町", "東日本橋"] if district in unique_districts],
+            )
+        if not selected_names:
+            st.info(f"少なくとも1つの{level}を選択してください。")
+            return
+
+        # 取り込み時に作成した解像度ごとの集計を読むため、元の行は再集計しない
+        rollup_df = self._evaluate(
+            "rollup",
+            {"resolution": resolution},
+            lambda: self._fetch_cached_df(rollup_summary_relation(resolution), f"rollup_{resolution}"),
+        )
+        # 集計は外れ値を含むものと除外したものの両方を持つ
+        rollup_df = rollup_df[rollup_df["OutliersExcluded"] == exclude_outliers]
+        if level == "市区町村":
+            name_column = "Municipality"
+            plot_df = rollup_df[rollup_df["Level"] == "municipality"]
+        else:
+            name_column = "DistrictName"
+            plot_df = rollup_df[rollup_df["Level"] == "district"]
+        plot_df = plot_df[plot_df[name_column].isin(selected_names)].sort_values("PeriodStart")
+        fig_rollup = px.line(
+            plot_df,
+            x="PeriodStart",
+            y="median",
+            color=name_column,
+            error_y=plot_df["q3"] - plot_df["median"],
+            error_y_minus=plot_df["median"] - plot_df["q1"],
+            markers=True,
+            hover_data=["PeriodLabel", "count", "q1", "q3", "mean_price_per_area"],
+            title=f"{RESOLUTIONS[resolution].label}ごとの面積単価の中央値（誤差棒は四分位範囲）",
+        )
+        st.plotly_chart(fig_rollup)
+        st.caption(f"分位点は取り込み時に作成したスケッチから求めた値です（相対誤差 ±{SKETCH_RELATIVE_ERROR:.0%}以内）。")
+
     def run(self):
         """データ分析の実行"""
         st.title("不動産データ分析")
+        self.graph.start_run()
         
-        rel = self._load_data()
+        # 取り込み時に作成した派生テーブルから、各チャートに必要な最小のテーブルを読む
+        rel = self._load_data("used_mansions")
         if rel is None:
             return
-            
-        rel = self._filter_used_mansions(rel)
-        rel = self._compute_tradeprice_per_area(rel)
-        
-        st.write("※ 以降のデータは中古マンション等のみとする")
-        self._plot_district_count_charts(rel)
-        self._plot_tradeprice_area_charts(rel)
+        district_stats = get_data_store().relation("district_quarter_stats")
+
+        try:
+            # 件数・選択肢はテーブルごとに1回の走査でまとめて集計し、各チャートに振り分ける
+            district_lookups, option_lookups = self._evaluate(
+                "lookups", {}, lambda: self._load_lookups(rel, district_stats)
+            )
+            counts_df = district_lookups.group("Municipality", "DistrictName").rename(
+                columns={"transactions": "件数"}
+            )
+            unique_districts = district_lookups.distinct("DistrictName")
+
+            st.write(
+                f"※ 以降のデータは中古マンション等のみとする"
+                f"（{district_lookups.total('transactions'):,}件, "
+                f"{district_lookups.total('municipalities')}市区町村）"
+            )
+            exclude_outliers = st.checkbox(
+                "外れ値を除外",
+                help=(
+                    f"地区・四半期ごとの面積単価の中央値からの頑健なzスコア（中央値・MADによる）の絶対値が"
+                    f"{OUTLIER_THRESHOLD}を超える取引（{district_lookups.total('outliers'):,}件）を、"
+                    "面積当たりの取引価格のチャート、前期比・前年同期比と期間別の推移から除外します。"
+                ),
+            )
+            self._plot_district_count_charts(counts_df)
+            self._plot_tradeprice_area_charts(rel, unique_districts, option_lookups, exclude_outliers)
+            self._plot_price_index_chart(district_stats, unique_districts)
+            self._render_period_comparison(district_stats, exclude_outliers)
+            self._plot_rollup_chart(
+                sorted(counts_df["Municipality"].unique().tolist()), unique_districts, exclude_outliers
+            )
+        except TimeoutError as e:
+            st.error(f"集計に時間がかかりすぎたため中断しました。条件を絞り込んでください: {e}")
+        self._render_query_counts()
 
 
 if __name__ == "__main__":
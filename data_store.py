@@ -0,0 +1,98 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import duckdb
+import streamlit as st
+
+from derived_tables import derived_dir, ensure_derived_tables
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = Path(__file__).parent / "data" / "data.parquet"
+
+
+def file_version(path: Path) -> Optional[str]:
+    """ファイルの更新日時とサイズからバージョン文字列を生成（ファイルがなければNone）"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class DataStore:
+    """data.parquetをインメモリのDuckDBテーブルとして保持し、セッション間で共有するクラス
+
+    ファイルは初回と更新時にのみ読み込み、各スレッド（Streamlitのセッション）には
+    同じデータベースを参照する専用のカーソルを渡す。
+    取り込み時に作成した派生テーブル（derived_tables）も同じバージョンで読み込む。
+    """
+
+    TABLE_NAME = "properties"
+
+    def __init__(self, data_file: Path = DATA_FILE):
+        self.data_file = data_file
+        self.version: Optional[str] = None
+        self.derived_manifest: Optional[Dict[str, Any]] = None
+        self._connection = duckdb.connect(":memory:")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """ファイルが更新されていればテーブルを読み込み直す"""
+        version = file_version(self.data_file)
+        if version is None:
+            raise FileNotFoundError(self.data_file)
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            self._connection.execute(
+                f"CREATE OR REPLACE TABLE {self.TABLE_NAME} AS "
+                f"SELECT * FROM read_parquet('{self.data_file.as_posix()}')"
+            )
+            manifest = ensure_derived_tables(self.data_file, version)
+            for name, table in manifest["tables"].items():
+                path = derived_dir(self.data_file) / table["file"]
+                self._connection.execute(
+                    f"CREATE OR REPLACE TABLE {name} AS "
+                    f"SELECT * FROM read_parquet('{path.as_posix()}')"
+                )
+            self.derived_manifest = manifest
+            self.version = version
+            logger.info(f"Loaded {self.data_file} into memory (version: {version})")
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """呼び出し元スレッド専用のカーソルを取得"""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            with self._lock:
+                cursor = self._connection.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def new_cursor(self) -> duckdb.DuckDBPyConnection:
+        """個別に中断できる新しいカーソルを作成（呼び出し元で閉じる）"""
+        self.refresh()
+        with self._lock:
+            return self._connection.cursor()
+
+    def execute(self, sql: str, values: Sequence[Any] = ()) -> duckdb.DuckDBPyConnection:
+        """バインド変数付きのSQLを呼び出し元スレッドのカーソルで実行"""
+        self.refresh()
+        return self.cursor().execute(sql, values)
+
+    def relation(self, table_name: str = TABLE_NAME) -> duckdb.DuckDBPyRelation:
+        """インメモリテーブル（省略時は全データ、指定時は派生テーブル）のrelationを取得"""
+        self.refresh()
+        return self.cursor().table(table_name)
+
+
+@st.cache_resource
+def get_data_store() -> DataStore:
+    """アプリ全体で共有するDataStoreを取得"""
+    return DataStore()
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple, TypeVar
+
+import streamlit as st
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Node:
+    """派生結果と、それを計算したときの入力"""
+    key: Tuple[Any, ...]
+    value: Any
+
+
+class DependencyGraph:
+    """派生結果ごとに依存する入力を宣言し、入力が変わった結果だけを再計算するクラス
+
+    結果の入力は、ウィジェットの値（inputs）とデータのバージョンからなる。
+    前回の実行と入力が同じ結果は保持している値をそのまま返す。
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, _Node] = {}
+        self.recomputed: List[str] = []
+        self.reused: List[str] = []
+
+    def start_run(self) -> None:
+        """スクリプトの実行ごとの再計算・再利用の記録を初期化"""
+        self.recomputed = []
+        self.reused = []
+
+    def evaluate(
+        self,
+        name: str,
+        inputs: Mapping[str, Hashable],
+        compute: Callable[[], T],
+        data_version: Optional[str] = None,
+    ) -> T:
+        """入力が前回から変わっていれば再計算し、変わっていなければ前回の結果を返す
+
+        Args:
+            name: 結果の名前
+            inputs: 結果が依存するウィジェットの値（ハッシュ可能な値）
+            compute: 結果を計算する関数
+            data_version: データのバージョン
+
+        Returns:
+            T: 結果
+        """
+        key = (data_version, tuple(sorted(inputs.items())))
+        node = self._nodes.get(name)
+        if node is not None and node.key == key:
+            self.reused.append(name)
+            return node.value
+
+        value = compute()
+        self._nodes[name] = _Node(key=key, value=value)
+        self.recomputed.append(name)
+        return value
+
+
+def get_dependency_graph(name: str) -> DependencyGraph:
+    """セッションごとの依存グラフを取得"""
+    key = f"dependency_graph_{name}"
+    if key not in st.session_state:
+        st.session_state[key] = DependencyGraph()
+    return st.session_state[key]
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+from outlier_scoring import robust_z_score_sql
+from time_rollups import ROLLUP_TABLES, rollup_definitions, update_rollups
+
+logger = logging.getLogger(__name__)
+
+USED_MANSION_TYPE = "中古マンション等"
+
+# 派生テーブルの定義（先に定義したテーブルを後のテーブルから参照できる）
+# source はデータファイル全体を表すビュー
+DERIVED_TABLES = {
+    # 中古マンション等の行に面積当たりの取引価格と、地区・四半期ごとの外れ値の判定を付与したもの
+    "used_mansions": robust_z_score_sql(
+        f"""
+        SELECT *, TradePrice / Area AS TradePricePerArea
+        FROM source WHERE Type = '{USED_MANSION_TYPE}'
+        """,
+        value="TradePricePerArea",
+        groups=["Municipality", "DistrictName", "Period"],
+    ),
+    # 市区町村・地区・四半期ごとの集計
+    "district_quarter_stats": """
+        SELECT Municipality, DistrictName, Period,
+            COUNT(*) AS count,
+            COUNT(*) FILTER (WHERE IsOutlier) AS outlier_count,
+            AVG(TradePricePerArea) AS mean_price_per_area,
+            MEDIAN(TradePricePerArea) AS median_price_per_area,
+            MIN(TradePricePerArea) AS min_price_per_area,
+            MAX(TradePricePerArea) AS max_price_per_area,
+            MEDIAN(TradePrice) AS median_trade_price,
+            COUNT(*) FILTER (WHERE NOT IsOutlier) AS inlier_count,
+            MEDIAN(TradePricePerArea) FILTER (WHERE NOT IsOutlier) AS inlier_median_price_per_area,
+            MEDIAN(TradePrice) FILTER (WHERE NOT IsOutlier) AS inlier_median_trade_price
+        FROM used_mansions
+        GROUP BY Municipality, DistrictName, Period
+    """,
+    # 市区町村ごとの集計
+    "municipality_stats": """
+        SELECT Municipality,
+            COUNT(*) AS count,
+            COUNT(DISTINCT DistrictName) AS district_count,
+            MIN(Period) AS first_period,
+            MAX(Period) AS last_period,
+            AVG(TradePricePerArea) AS mean_price_per_area,
+            MEDIAN(TradePricePerArea) AS median_price_per_area
+        FROM used_mansions
+        GROUP BY Municipality
+    """,
+}
+
+
+def definitions_version() -> str:
+    """派生テーブル・期間別集計の定義から、定義が変わったことを検出するためのバージョン文字列を生成"""
+    definitions = {"tables": DERIVED_TABLES, "rollups": rollup_definitions()}
+    return hashlib.sha256(json.dumps(definitions, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def table_names() -> List[str]:
+    """取り込み時に作成するテーブル（派生テーブルと期間別集計）の一覧"""
+    return list(DERIVED_TABLES) + ROLLUP_TABLES
+
+
+def derived_dir(data_file: Path) -> Path:
+    """データファイルに対応する派生テーブルの保存先ディレクトリを取得"""
+    return data_file.with_name("derived")
+
+
+def manifest_path(data_file: Path) -> Path:
+    """派生テーブルの一覧（マニフェスト）のパスを取得"""
+    return derived_dir(data_file) / "manifest.json"
+
+
+def load_manifest(data_file: Path) -> Optional[Dict[str, Any]]:
+    """保存済みのマニフェストを読み込む（存在しないか読めない場合はNone）"""
+    try:
+        return json.loads(manifest_path(data_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def build_derived_tables(data_file: Path, data_version: Optional[str]) -> Dict[str, Any]:
+    """データファイルから派生テーブルを作成してParquetとマニフェストを保存
+
+    期間別集計（time_rollups）は、前回と定義が同じであれば内容が変わった四半期の分だけを更新する。
+
+    Args:
+        data_file: 整形済みのデータファイル
+        data_version: 派生テーブルを作成したデータのバージョン
+
+    Returns:
+        Dict[str, Any]: マニフェスト（データ・定義のバージョン、テーブルごとのファイル名・行数と
+            期間別集計を作成した四半期ごとの内容を表す値）
+    """
+    output_dir = derived_dir(data_file)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    previous = load_manifest(data_file)
+    previous_fingerprints = (
+        previous.get("quarter_fingerprints")
+        if previous is not None and previous.get("definitions_version") == definitions_version()
+        else None
+    )
+    manifest = {"data_version": data_version, "definitions_version": definitions_version(), "tables": {}}
+
+    with duckdb.connect(":memory:") as connection:
+        connection.execute(
+            f"CREATE VIEW source AS SELECT * FROM read_parquet('{data_file.as_posix()}')"
+        )
+        for name, sql in DERIVED_TABLES.items():
+            connection.execute(f"CREATE TABLE {name} AS {sql}")
+            path = output_dir / f"{name}.parquet"
+            connection.execute(f"COPY {name} TO '{path.as_posix()}' (FORMAT PARQUET)")
+            rows = connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            manifest["tables"][name] = {"file": path.name, "rows": rows}
+        rollup_tables, manifest["quarter_fingerprints"] = update_rollups(
+            connection, output_dir, previous_fingerprints
+        )
+        manifest["tables"].update(rollup_tables)
+
+    manifest_path(data_file).write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"Derived tables saved to {output_dir}")
+    return manifest
+
+
+def ensure_derived_tables(data_file: Path, data_version: Optional[str]) -> Dict[str, Any]:
+    """データ・定義と一致する派生テーブルのマニフェストを取得（存在しないか古い場合は作り直す）"""
+    manifest = load_manifest(data_file)
+    try:
+        if manifest is not None:
+            files_exist = all(
+                (derived_dir(data_file) / table["file"]).exists()
+                for table in manifest["tables"].values()
+            )
+            if (
+                manifest.get("data_version") == data_version
+                and manifest.get("definitions_version") == definitions_version()
+                and set(manifest["tables"]) == set(table_names())
+                and files_exist
+            ):
+                return manifest
+    except KeyError:
+        pass
+
+    logger.info("Derived tables are missing or outdated. Rebuilding from data file")
+    return build_derived_tables(data_file, data_version)
@@ -0,0 +1,169 @@
+import bisect
+import json
+import logging
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_store import DATA_FILE, file_version
+
+logger = logging.getLogger(__name__)
+
+# カタカナ（ァ-ヶ）をひらがなに変換するテーブル
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def normalize(text: str) -> str:
+    """検索用に文字列を正規化（NFKCで全角・半角を統一し、カタカナをひらがなに変換）"""
+    text = unicodedata.normalize("NFKC", text).translate(_KATAKANA_TO_HIRAGANA)
+    return "".join(text.lower().split())
+
+
+def bigrams(text: str) -> List[str]:
+    """文字列の2-gramを取得（1文字の場合はその文字）"""
+    if len(text) < 2:
+        return [text] if text else []
+    return sorted({text[i:i + 2] for i in range(len(text) - 1)})
+
+
+def index_path(data_file: Path = DATA_FILE) -> Path:
+    """データファイルに対応する索引ファイルのパスを取得"""
+    return data_file.with_name("district_index.json")
+
+
+class DistrictIndex:
+    """地区名・市区町村名の2-gram転置索引
+
+    前方一致を二分探索で、あいまい一致を2-gramの重なり（Dice係数）で検索する。
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data: build_indexで作成した索引データ
+        """
+        self.data_version: Optional[str] = data["data_version"]
+        self.names: List[str] = data["names"]
+        self.kinds: List[str] = data["kinds"]
+        self.districts_by_municipality: Dict[str, List[str]] = data["districts_by_municipality"]
+        self.normalized = [normalize(name) for name in self.names]
+        self.gram_counts = np.array([len(bigrams(name)) for name in self.normalized])
+        self.postings = {gram: np.array(ids) for gram, ids in data["postings"].items()}
+        # 前方一致検索用に正規化済みの名前をソート
+        self._prefix_order = sorted(range(len(self.names)), key=lambda i: self.normalized[i])
+        self._prefix_keys = [self.normalized[i] for i in self._prefix_order]
+
+    @staticmethod
+    def build_index(pairs: pd.DataFrame, data_version: Optional[str]) -> Dict[str, Any]:
+        """市区町村名・地区名の組から索引データを作成
+
+        Args:
+            pairs: Municipality・DistrictNameカラムを持つDataFrame
+            data_version: 索引を作成したデータのバージョン
+        """
+        pairs = pairs[["Municipality", "DistrictName"]].dropna().drop_duplicates()
+        districts_by_municipality = {
+            municipality: sorted(group["DistrictName"].unique().tolist())
+            for municipality, group in pairs.groupby("Municipality")
+        }
+        names = sorted(pairs["DistrictName"].unique().tolist())
+        kinds = ["DistrictName"] * len(names)
+        municipalities = sorted(districts_by_municipality)
+        names += municipalities
+        kinds += ["Municipality"] * len(municipalities)
+
+        postings = defaultdict(list)
+        for i, name in enumerate(names):
+            for gram in bigrams(normalize(name)):
+                postings[gram].append(i)
+
+        return {
+            "data_version": data_version,
+            "names": names,
+            "kinds": kinds,
+            "districts_by_municipality": districts_by_municipality,
+            "postings": dict(postings),
+        }
+
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 50, min_score: float = 0.3) -> List[str]:
+        """前方一致とあいまい一致で名前を検索
+
+        Args:
+            query: 検索文字列
+            kind: "DistrictName" または "Municipality" で種類を限定
+            limit: 取得する最大件数
+            min_score: あいまい一致として採用するDice係数の下限
+
+        Returns:
+            List[str]: 前方一致、あいまい一致の順に並べた名前
+        """
+        normalized_query = normalize(query)
+        if not normalized_query:
+            return []
+
+        # 前方一致（二分探索で範囲を特定）
+        start = bisect.bisect_left(self._prefix_keys, normalized_query)
+        end = bisect.bisect_left(self._prefix_keys, normalized_query + "\uffff")
+        prefix_ids = [self._prefix_order[i] for i in range(start, end)]
+
+        # あいまい一致（検索語の2-gramを含む名前ごとに一致数を数えてDice係数を計算）
+        query_grams = bigrams(normalized_query)
+        candidate_lists = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        fuzzy_ids: List[int] = []
+        if candidate_lists:
+            ids, counts = np.unique(np.concatenate(candidate_lists), return_counts=True)
+            scores = 2 * counts / (len(query_grams) + self.gram_counts[ids])
+            order = np.argsort(-scores, kind="stable")
+            fuzzy_ids = ids[order][scores[order] >= min_score].tolist()
+
+        results = []
+        seen = set()
+        for i in prefix_ids + fuzzy_ids:
+            if i in seen or (kind is not None and self.kinds[i] != kind):
+                continue
+            seen.add(i)
+            results.append(self.names[i])
+            if len(results) >= limit:
+                break
+        return results
+
+    def search_districts(self, query: str, limit: int = 200) -> List[str]:
+        """地区名を検索（市区町村名に一致した場合はその市区町村の地区も含める）"""
+        districts = self.search(query, kind="DistrictName", limit=limit)
+        for municipality in self.search(query, kind="Municipality", limit=limit):
+            districts += self.districts_by_municipality.get(municipality, [])
+        return list(dict.fromkeys(districts))[:limit]
+
+
+def save_index(data: Dict[str, Any], data_file: Path = DATA_FILE) -> None:
+    """索引データをデータファイルと同じディレクトリに保存"""
+    path = index_path(data_file)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"District index saved to {path}")
+
+
+@st.cache_resource(max_entries=1)
+def _load_index(data_version: Optional[str]) -> DistrictIndex:
+    """索引を読み込み（データと一致しない場合は作り直す）"""
+    try:
+        data = json.loads(index_path().read_text(encoding="utf-8"))
+        if data.get("data_version") == data_version:
+            return DistrictIndex(data)
+    except (OSError, ValueError):
+        pass
+
+    logger.info("District index is missing or outdated. Rebuilding from data file")
+    pairs = pd.read_parquet(DATA_FILE, columns=["Municipality", "DistrictName"])
+    data = DistrictIndex.build_index(pairs, data_version)
+    save_index(data)
+    return DistrictIndex(data)
+
+
+def get_district_index() -> DistrictIndex:
+    """現在のデータに対応する地区名索引を取得"""
+    return _load_index(file_version(DATA_FILE))
@@ -0,0 +1,75 @@
+from typing import Any, Dict
+
+import duckdb
+
+from data_store import DataStore
+from query_runner import get_query_runner
+from result_cache import get_result_cache
+from search_query import LIST_FILTERS, compile_search
+
+# ファセット件数: {パラメータ名: {選択肢: 件数}}
+FacetCounts = Dict[str, Dict[Any, int]]
+
+
+def compute_facet_counts(cursor: duckdb.DuckDBPyConnection, params: Dict[str, Any]) -> FacetCounts:
+    """全ての選択式フィルタの選択肢ごとの件数を1回のGROUPING SETSスキャンで集計
+
+    各ファセットの件数は、そのファセット自身の選択を除いた検索条件で数える
+    （選択中の項目以外を追加したときに何件になるかが分かるようにする）。
+    範囲指定の条件は全ファセットに共通なのでWHERE句で先に絞り込む。
+
+    Args:
+        cursor: クエリを実行するカーソル
+        params: 検索パラメータの辞書
+
+    Returns:
+        FacetCounts: パラメータ名ごとの選択肢と件数
+    """
+    columns = list(LIST_FILTERS.values())
+    list_params = {key: params.get(key) for key in LIST_FILTERS}
+    base = compile_search(params, exclude=columns)
+
+    # ファセットごとの件数条件。選択のないファセットは同じ条件になるので共有する
+    aggregates = []
+    values = []
+    aggregate_by_condition = {}
+    aggregate_by_column = {}
+    for column in columns:
+        condition = compile_search(list_params, exclude=[column])
+        if condition not in aggregate_by_condition:
+            aggregate_by_condition[condition] = len(aggregates)
+            aggregates.append(f"COUNT(*) FILTER (WHERE {condition.where})")
+            values.extend(condition.values)
+        aggregate_by_column[column] = aggregate_by_condition[condition]
+
+    sql = (
+        f"SELECT {', '.join(columns)}, "
+        f"{', '.join(f'GROUPING({column})' for column in columns)}, "
+        f"{', '.join(aggregates)} "
+        f"FROM {DataStore.TABLE_NAME} WHERE {base.where} "
+        f"GROUP BY GROUPING SETS ({', '.join(f'({column})' for column in columns)})"
+    )
+    rows = cursor.execute(sql, values + list(base.values)).fetchall()
+
+    counts: FacetCounts = {key: {} for key in LIST_FILTERS}
+    n = len(columns)
+    for row in rows:
+        for i, (key, column) in enumerate(LIST_FILTERS.items()):
+            # GROUPING()が0のカラムがこの行の集計対象
+            if row[n + i] == 0:
+                if row[i] is not None:
+                    counts[key][row[i]] = row[2 * n + aggregate_by_column[column]]
+                break
+    return counts
+
+
+def get_facet_counts(store: DataStore, params: Dict[str, Any]) -> FacetCounts:
+    """検索条件ごとにキャッシュしたファセット件数を取得"""
+    store.refresh()
+    return get_result_cache().get_or_compute(
+        ("facets", compile_search(params)),
+        store.version,
+        lambda: get_query_runner().run(
+            "facet_counts", lambda cursor: compute_facet_counts(cursor, params)
+        ),
+    )
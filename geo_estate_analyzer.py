@@ -1,7 +1,9 @@
+import logging
 import unicodedata
 from datetime import datetime, timedelta
 
 import folium
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
@@ -12,7 +14,15 @@ from components.ui_components import (
     render_action_buttons,
     render_control_panel,
     render_location_inputs,
+    render_search_area_selector,
 )
+from geo_polygon import points_in_polygon, polygon_tiles
+from outlier_scoring import OUTLIER_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+SEARCH_AREA_TILE = "クリック地点のタイル"
+SEARCH_AREA_POLYGON = "描画したポリゴン"
 
 
 class GeoEstateAnalyzer:
@@ -35,7 +45,11 @@ class GeoEstateAnalyzer:
                 'markers': [],
                 'reset_clicked': False,
                 'selected_price_category': "すべて",  # 価格区分の初期値
-                'selected_floor_plans': ["すべて"]   # 間取りの初期値
+                'selected_floor_plans': ["すべて"],  # 間取りの初期値
+                'exclude_outliers': False,  # 外れ値の除外の初期値
+                'filtered_outlier_flags': [],  # フィルタリング後の各featureの外れ値フラグ
+                'polygon': None,  # 地図上で描画したポリゴンの座標
+                'search_area': SEARCH_AREA_TILE,  # 検索範囲の指定方法
             }
             
             # 全ての値をセット
@@ -84,6 +98,16 @@ class GeoEstateAnalyzer:
                 st.session_state.selected_floor_plans = ["すべて"]
                 st.rerun()
 
+        st.session_state.exclude_outliers = st.checkbox(
+            "外れ値を除外",
+            value=st.session_state.get("exclude_outliers", False),
+            help=(
+                f"地区・時期ごとの単位面積あたりの価格の中央値からの頑健なzスコアの絶対値が"
+                f"{OUTLIER_THRESHOLD}を超える取引を除外します（除外しない場合は灰色のマーカーで表示）。"
+            ),
+            key="exclude_outliers_checkbox"
+        )
+
     def _handle_data_fetch(self, zoom_level, from_date, to_date):
         """データ取得処理"""
         try:
@@ -91,13 +115,18 @@ class GeoEstateAnalyzer:
             
             # データのダウンロード
             downloader = GeoJsonDownloader()
-            st.session_state.geojson_data = downloader.get_geojson(
-                lat=st.session_state.input_lat,
-                lon=st.session_state.input_lng,
-                zoom=zoom_level,
-                from_date=from_date,
-                to_date=to_date
-            )
+            if st.session_state.search_area == SEARCH_AREA_POLYGON:
+                st.session_state.geojson_data = self._fetch_polygon_geojson(
+                    downloader, zoom_level, from_date, to_date
+                )
+            else:
+                st.session_state.geojson_data = downloader.get_geojson(
+                    lat=st.session_state.input_lat,
+                    lon=st.session_state.input_lng,
+                    zoom=zoom_level,
+                    from_date=from_date,
+                    to_date=to_date
+                )
 
             # データの処理
             processor = GeoJsonProcessor()
@@ -109,9 +138,55 @@ class GeoEstateAnalyzer:
             # マーカー情報の更新
             self._update_markers()
 
+            # 次の検索に備えて周辺タイルを先読み
+            self._start_prefetch(zoom_level, from_date, to_date)
+
         except Exception as e:
             st.error(f"データの取得中にエラーが発生しました: {str(e)}")
 
+    def _start_prefetch(self, zoom_level, from_date, to_date):
+        """クリック地点と周囲8タイルの先読みをバックグラウンドで開始"""
+        try:
+            if 'tile_prefetcher' not in st.session_state:
+                from real_estate_data_processor import GeoJsonDownloader
+                from tile_prefetcher import TilePrefetcher
+                st.session_state.tile_prefetcher = TilePrefetcher(GeoJsonDownloader())
+            st.session_state.tile_prefetcher.start(
+                st.session_state.input_lat,
+                st.session_state.input_lng,
+                zoom_level,
+                from_date,
+                to_date,
+            )
+        except Exception as e:
+            # 先読みの失敗は検索に影響させない
+            logger.warning(f"Failed to start tile prefetch: {e}")
+
+    def _fetch_polygon_geojson(self, downloader, zoom_level, from_date, to_date):
+        """ポリゴンと重なるタイルを取得し、ポリゴン内の地物のみを返す"""
+        polygon = st.session_state.polygon
+        if not polygon:
+            raise ValueError("地図上でポリゴンを描画してください")
+
+        tiles = polygon_tiles(polygon, zoom_level)
+        geojson_data = downloader.get_geojson_for_tiles(
+            tiles, zoom_level, from_date=from_date, to_date=to_date
+        )
+
+        # 座標を配列にまとめてポリゴン内判定を一括で行う
+        features = [
+            feature for feature in geojson_data['features']
+            if feature.get('geometry', {}).get('type') == 'Point'
+        ]
+        if not features:
+            return {**geojson_data, 'features': []}
+        coordinates = np.array([feature['geometry']['coordinates'][:2] for feature in features])
+        inside = points_in_polygon(coordinates[:, 0], coordinates[:, 1], polygon)
+        return {
+            **geojson_data,
+            'features': [feature for feature, keep in zip(features, inside) if keep],
+        }
+
     def _filter_by_price_category(self, df):
         """価格情報区分でフィルタリング"""
         if st.session_state.selected_price_category != "すべて":
@@ -130,6 +205,12 @@ class GeoEstateAnalyzer:
             )]
         return df
 
+    def _filter_outliers(self, df):
+        """外れ値と判定された取引を除外"""
+        if st.session_state.exclude_outliers and 'is_outlier' in df.columns:
+            return df[~df['is_outlier']]
+        return df
+
     def _apply_filters(self):
         """選択された価格区分と間取りに基づいてデータをフィルタリング"""
         if st.session_state.df is None or st.session_state.df.empty:
@@ -142,6 +223,9 @@ class GeoEstateAnalyzer:
         
         # 間取りフィルター (複数選択対応)
         filtered_df = self._filter_by_floor_plan(filtered_df)
+
+        # 外れ値の除外
+        filtered_df = self._filter_outliers(filtered_df)
         
         # フィルタリングされたデータフレームを保存
         st.session_state.filtered_df = filtered_df
@@ -153,18 +237,32 @@ class GeoEstateAnalyzer:
         """GeoJSONデータをフィルタリング"""
         if not isinstance(st.session_state.geojson_data, dict) or 'features' not in st.session_state.geojson_data:
             st.session_state.filtered_geojson = st.session_state.geojson_data
+            st.session_state.filtered_outlier_flags = []
             return
             
         filtered_features = []
+        filtered_outlier_flags = []
+
+        # DataFrameの各行はGeoJSONの各featureと同じ順序で作成されている
+        features = st.session_state.geojson_data['features']
+        df = st.session_state.df
+        if df is not None and 'is_outlier' in df.columns and len(df) == len(features):
+            outlier_flags = df['is_outlier'].tolist()
+        else:
+            outlier_flags = [False] * len(features)
         
         # 間取り選択の正規化（複数選択対応）
         normalized_floor_plans = None
         if "すべて" not in st.session_state.selected_floor_plans and st.session_state.selected_floor_plans:
             normalized_floor_plans = [unicodedata.normalize('NFKC', fp) for fp in st.session_state.selected_floor_plans]
         
-        for feature in st.session_state.geojson_data['features']:
+        for feature, is_outlier in zip(features, outlier_flags):
             include_feature = True
             properties = feature.get('properties', {})
+
+            # 外れ値の除外
+            if is_outlier and st.session_state.exclude_outliers:
+                include_feature = False
             
             # 価格情報区分フィルター
             if st.session_state.selected_price_category != "すべて":
@@ -183,11 +281,13 @@ class GeoEstateAnalyzer:
             
             if include_feature:
                 filtered_features.append(feature)
+                filtered_outlier_flags.append(is_outlier)
         
         # フィルタリングされたGeoJSONを保存
         filtered_geojson = st.session_state.geojson_data.copy()
         filtered_geojson['features'] = filtered_features
         st.session_state.filtered_geojson = filtered_geojson
+        st.session_state.filtered_outlier_flags = filtered_outlier_flags
 
     def _update_markers(self):
         """マーカー情報の更新"""
@@ -198,17 +298,22 @@ class GeoEstateAnalyzer:
             return
             
         st.session_state.markers = []
-        for feature in geojson_data['features']:
+        outlier_flags = st.session_state.get('filtered_outlier_flags') or []
+        for i, feature in enumerate(geojson_data['features']):
             if feature['geometry']['type'] == 'Point':
                 lng, lat = feature['geometry']['coordinates']
                 properties = feature['properties']
+                is_outlier = i < len(outlier_flags) and outlier_flags[i]
                 popup_content = '<br>'.join([
                     f"<b>{k}</b>: {v}" for k, v in properties.items()
                 ])
+                if is_outlier:
+                    popup_content = "<b>外れ値の可能性があります</b><br>" + popup_content
                 st.session_state.markers.append({
                     'lat': lat,
                     'lng': lng,
-                    'popup': popup_content
+                    'popup': popup_content,
+                    'color': 'gray' if is_outlier else 'red'
                 })
 
     def run(self):
@@ -219,6 +324,9 @@ class GeoEstateAnalyzer:
         # UI要素の表示
         render_location_inputs(st.session_state)
         zoom_level, (from_date, to_date) = render_control_panel()
+        st.session_state.search_area = render_search_area_selector(
+            [SEARCH_AREA_TILE, SEARCH_AREA_POLYGON], st.session_state.search_area
+        )
         
         # フィルタリングオプションの表示
         self._display_filter_options()
@@ -231,6 +339,8 @@ class GeoEstateAnalyzer:
 
         # アクションの処理
         if clear_data_clicked:
+            if 'tile_prefetcher' in st.session_state:
+                st.session_state.tile_prefetcher.cancel()
             st.session_state.reset_clicked = True
             st.session_state.should_process_data = False
             self._initialize_session_state()
@@ -260,7 +370,9 @@ class GeoEstateAnalyzer:
             self._display_data()
         
         # 地図は常に表示
-        self._display_map(zoom_level)
+        self._display_map(zoom_level, from_date, to_date)
+
+        self._display_scheduler_metrics()
 
     def _display_data(self):
         """データとグラフの表示"""
@@ -349,7 +461,23 @@ class GeoEstateAnalyzer:
         )
         st.plotly_chart(fig, use_container_width=True)
 
-    def _display_map(self, zoom_level):
+    def _display_scheduler_metrics(self):
+        """APIリクエストスケジューラの状態を表示"""
+        from api_scheduler import get_scheduler
+        from real_estate_data_processor import DataConfig
+
+        with st.expander("APIリクエストの状況"):
+            metrics_df = pd.DataFrame(get_scheduler(DataConfig()).metrics()).T
+            metrics_df = metrics_df.rename(columns={
+                'queue_depth': '待ち件数',
+                'completed': '完了件数',
+                'wait_avg': '平均待ち時間（秒）',
+                'wait_p95': '95%待ち時間（秒）',
+                'wait_max': '最大待ち時間（秒）',
+            })
+            st.dataframe(metrics_df, use_container_width=True)
+
+    def _display_map(self, zoom_level, from_date, to_date):
         """地図の表示"""
         m = folium.Map(
             location=[st.session_state.input_lat, st.session_state.input_lng],
@@ -358,21 +486,43 @@ class GeoEstateAnalyzer:
             zoom_control=True
         )
 
-        # タイル範囲の矩形を表示
-        from real_estate_data_processor import GeoJsonDownloader
-        downloader = GeoJsonDownloader()
-        x, y = downloader.latlon_to_tile(st.session_state.input_lat, st.session_state.input_lng, zoom_level)
-        south, west, north, east = downloader.get_tile_bounds(x, y, zoom_level)
-        
-        # 矩形の座標を設定
-        bounds = [[south, west], [north, east]]
-        folium.Rectangle(
-            bounds=bounds,
-            color='red',
-            weight=2,
-            fill=False,
-            popup=f'Tile: x={x}, y={y}, zoom={zoom_level}'
-        ).add_to(m)
+        if st.session_state.search_area == SEARCH_AREA_POLYGON:
+            # 描画済みのポリゴンを表示
+            if st.session_state.polygon:
+                folium.Polygon(
+                    locations=[[lat, lng] for lng, lat in st.session_state.polygon[0]],
+                    color='red',
+                    weight=2,
+                    fill=False,
+                    popup=f'タイル数: {len(polygon_tiles(st.session_state.polygon, zoom_level))}'
+                ).add_to(m)
+
+            # ポリゴン・矩形の描画ツールを追加
+            plugins.Draw(
+                export=False,
+                draw_options={
+                    'polyline': False,
+                    'circle': False,
+                    'circlemarker': False,
+                    'marker': False,
+                },
+                edit_options={'edit': False},
+            ).add_to(m)
+        else:
+            # タイル範囲の矩形を表示
+            from real_estate_data_processor import GeoJsonDownloader
+            x, y = GeoJsonDownloader.latlon_to_tile(st.session_state.input_lat, st.session_state.input_lng, zoom_level)
+            south, west, north, east = GeoJsonDownloader.get_tile_bounds(x, y, zoom_level)
+            
+            # 矩形の座標を設定
+            bounds = [[south, west], [north, east]]
+            folium.Rectangle(
+                bounds=bounds,
+                color='red',
+                weight=2,
+                fill=False,
+                popup=f'Tile: x={x}, y={y}, zoom={zoom_level}'
+            ).add_to(m)
 
         # マーカークラスターの作成
         marker_cluster = folium.plugins.MarkerCluster(
@@ -391,7 +541,7 @@ class GeoEstateAnalyzer:
                 folium.Marker(
                     location=[marker_data['lat'], marker_data['lng']],
                     popup=folium.Popup(marker_data['popup'], max_width=300),
-                    icon=folium.Icon(color='red', icon='info-sign')
+                    icon=folium.Icon(color=marker_data.get('color', 'red'), icon='info-sign')
                 ).add_to(marker_cluster)
 
         # 地図の表示とクリックイベントの処理
@@ -399,15 +549,23 @@ class GeoEstateAnalyzer:
             m,
             height=600,
             width="100%",
-            returned_objects=["last_clicked"],
+            returned_objects=["last_clicked", "last_active_drawing"],
             key="map",
             use_container_width=True
         )
 
         # クリックイベントの処理
         if map_data['last_clicked']:
-            st.session_state.input_lat = map_data['last_clicked']['lat']
-            st.session_state.input_lng = map_data['last_clicked']['lng']
+            clicked = (map_data['last_clicked']['lat'], map_data['last_clicked']['lng'])
+            if clicked != (st.session_state.input_lat, st.session_state.input_lng):
+                st.session_state.input_lat, st.session_state.input_lng = clicked
+                # 検索ボタンが押される前に周辺タイルの取得を始めておく
+                self._start_prefetch(zoom_level, from_date, to_date)
+
+        # 描画イベントの処理（ポリゴン・矩形のみを検索範囲として採用）
+        drawing = map_data.get('last_active_drawing')
+        if drawing and drawing.get('geometry', {}).get('type') == 'Polygon':
+            st.session_state.polygon = drawing['geometry']['coordinates']
 
 def geo_estate_analyzer():
     """アプリケーションのエントリーポイント"""
@@ -0,0 +1,109 @@
+from math import floor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def to_tile_space(lngs, lats, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """緯度経度の配列をWebメルカトルのタイル座標（小数）にベクトル変換
+
+    Args:
+        lngs: 経度の配列
+        lats: 緯度の配列
+        zoom: ズームレベル
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (タイルX座標, タイルY座標)
+    """
+    n = 2**zoom
+    lng_arr = np.asarray(lngs, dtype=float)
+    lat_rad = np.radians(np.asarray(lats, dtype=float))
+    x = n * (lng_arr + 180) / 360
+    y = n * (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2
+    return x, y
+
+
+def _points_in_ring(x: np.ndarray, y: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """レイキャスティング法による点の内外判定（辺ごとにループし、点はベクトル処理）"""
+    inside = np.zeros(x.shape, dtype=bool)
+    ax, ay = ring[:, 0], ring[:, 1]
+    bx, by = np.roll(ax, -1), np.roll(ay, -1)
+    for x1, y1, x2, y2 in zip(ax, ay, bx, by):
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        x_intersect = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < x_intersect)
+    return inside
+
+
+def _ring_to_tile_space(ring: Sequence[Sequence[float]], zoom: int) -> np.ndarray:
+    """GeoJSONのリング（[経度, 緯度]の列）をタイル座標に変換"""
+    coords = np.asarray(ring, dtype=float)[:, :2]
+    if len(coords) > 1 and np.array_equal(coords[0], coords[-1]):
+        coords = coords[:-1]
+    x, y = to_tile_space(coords[:, 0], coords[:, 1], zoom)
+    return np.column_stack([x, y])
+
+
+def points_in_polygon(lngs, lats, polygon: List[Sequence[Sequence[float]]]) -> np.ndarray:
+    """点群がポリゴン内にあるかをまとめて判定
+
+    地図上で描画されたポリゴンの辺はメルカトル投影上の直線なので、
+    判定もメルカトル座標（ズーム0のタイル座標）で行う。
+
+    Args:
+        lngs: 経度の配列
+        lats: 緯度の配列
+        polygon: GeoJSON Polygonの座標（先頭が外周、以降が穴）
+
+    Returns:
+        np.ndarray: 各点がポリゴン内にあればTrueとなる真偽値配列
+    """
+    x, y = to_tile_space(lngs, lats, 0)
+    exterior, *holes = polygon
+    inside = _points_in_ring(x, y, _ring_to_tile_space(exterior, 0))
+    for hole in holes:
+        inside &= ~_points_in_ring(x, y, _ring_to_tile_space(hole, 0))
+    return inside
+
+
+def polygon_tiles(polygon: List[Sequence[Sequence[float]]], zoom: int) -> List[Tuple[int, int]]:
+    """ポリゴンと重なるタイル座標の一覧を取得
+
+    外周が通過するタイルと、中心がポリゴン内にあるタイルの和集合を返す。
+
+    Args:
+        polygon: GeoJSON Polygonの座標（先頭が外周、以降が穴）
+        zoom: ズームレベル
+
+    Returns:
+        List[Tuple[int, int]]: (タイルX座標, タイルY座標)のソート済みリスト
+    """
+    ring = _ring_to_tile_space(polygon[0], zoom)
+    tiles = set()
+
+    # 外周が通過するタイル（列ごとに線分をクリップして行範囲を求める）
+    for (x1, y1), (x2, y2) in zip(ring, np.roll(ring, -1, axis=0)):
+        if floor(x1) == floor(x2):
+            for ty in range(floor(min(y1, y2)), floor(max(y1, y2)) + 1):
+                tiles.add((floor(x1), ty))
+            continue
+        for tx in range(floor(min(x1, x2)), floor(max(x1, x2)) + 1):
+            cx1, cx2 = max(tx, min(x1, x2)), min(tx + 1, max(x1, x2))
+            cy1 = y1 + (cx1 - x1) * (y2 - y1) / (x2 - x1)
+            cy2 = y1 + (cx2 - x1) * (y2 - y1) / (x2 - x1)
+            for ty in range(floor(min(cy1, cy2)), floor(max(cy1, cy2)) + 1):
+                tiles.add((tx, ty))
+
+    # 内部に完全に含まれるタイル（タイル中心で判定）
+    min_x, min_y = np.floor(ring.min(axis=0)).astype(int)
+    max_x, max_y = np.floor(ring.max(axis=0)).astype(int)
+    grid_x, grid_y = np.meshgrid(
+        np.arange(min_x, max_x + 1), np.arange(min_y, max_y + 1)
+    )
+    grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+    inside = _points_in_ring(grid_x + 0.5, grid_y + 0.5, ring)
+    tiles.update(zip(grid_x[inside].tolist(), grid_y[inside].tolist()))
+
+    return sorted(tiles)
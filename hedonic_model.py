@@ -0,0 +1,216 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_store import DATA_FILE, file_version, get_data_store
+
+logger = logging.getLogger(__name__)
+
+# 説明変数に使用するカラム
+NUMERIC_FEATURES = ["CoverageRatio", "FloorAreaRatio"]
+CATEGORICAL_FEATURES = ["FloorPlan", "Structure", "DistrictName", "Quarter"]
+INPUT_COLUMNS = [
+    "Municipality", "DistrictName", "Area", "BuildingYear", "FloorPlan", "Structure",
+    "Period", "CoverageRatio", "FloorAreaRatio",
+]
+RIDGE_PENALTY = 1.0  # 件数の少ないカテゴリの係数を安定させるための正則化の強さ
+MIN_TRAINING_ROWS = 50  # 市区町村ごとのモデルを作成する最小件数
+
+
+def quarter_labels(period: pd.Series) -> pd.Series:
+    """取引時点を四半期のラベル（例: 2024Q3）に変換"""
+    period = pd.to_datetime(period)
+    return period.dt.year.astype("Int64").astype(str) + "Q" + period.dt.quarter.astype("Int64").astype(str)
+
+
+@dataclass
+class HedonicModel:
+    """1つの市区町村のヘドニック回帰モデル
+
+    log(取引価格) を log(面積)・築年数・建蔽率・容積率と、間取り・構造・地区・四半期の
+    ダミー変数で回帰する。欠損値は学習データの中央値で補完し、欠損の有無も説明変数に加える。
+    """
+    municipality: str
+    coefficients: np.ndarray
+    levels: Dict[str, List[str]]
+    fill_values: Dict[str, float]
+    residual_std: float
+    r_squared: float
+    training_rows: int
+
+    def design_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """説明変数の行列を作成（学習時にないカテゴリは全ダミーが0になる）"""
+        columns = [np.ones(len(df)), np.log(df["Area"].to_numpy(dtype=float))]
+        age = df["Age"].to_numpy(dtype=float)
+        columns += [np.where(np.isnan(age), self.fill_values["Age"], age), np.isnan(age).astype(float)]
+        for feature in NUMERIC_FEATURES:
+            values = df[feature].to_numpy(dtype=float)
+            columns += [
+                np.where(np.isnan(values), self.fill_values[feature], values),
+                np.isnan(values).astype(float),
+            ]
+        numeric = np.column_stack(columns)
+
+        dummies = []
+        for feature in CATEGORICAL_FEATURES:
+            levels = self.levels[feature]
+            codes = pd.Categorical(df[feature], categories=levels).codes
+            one_hot = np.zeros((len(df), len(levels)))
+            known = codes >= 0
+            one_hot[np.flatnonzero(known), codes[known]] = 1.0
+            dummies.append(one_hot)
+        return np.hstack([numeric] + dummies)
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """取引価格を推定（対数正規分布の平均に補正した値）"""
+        log_price = self.design_matrix(df) @ self.coefficients
+        return np.exp(log_price + self.residual_std ** 2 / 2)
+
+
+def prepare_features(df: pd.DataFrame, latest_quarter: Optional[str] = None) -> pd.DataFrame:
+    """入力データに築年数と四半期のラベルを追加
+
+    取引時点がない行は、latest_quarter（学習データの最新の四半期）の取引として扱う。
+    """
+    df = df.copy()
+    period = pd.to_datetime(df["Period"]) if "Period" in df else pd.Series(pd.NaT, index=df.index)
+    df["Quarter"] = quarter_labels(period).where(period.notna(), latest_quarter)
+    trade_year = period.dt.year + (period.dt.quarter - 1) / 4
+    if latest_quarter is not None:
+        year, quarter = latest_quarter.split("Q")
+        trade_year = trade_year.fillna(int(year) + (int(quarter) - 1) / 4)
+    df["Age"] = trade_year - pd.to_numeric(df["BuildingYear"], errors="coerce")
+    for column in ["Area"] + NUMERIC_FEATURES:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
+
+
+def fit_municipality(municipality: str, df: pd.DataFrame, penalty: float = RIDGE_PENALTY) -> HedonicModel:
+    """1つの市区町村のデータからヘドニック回帰モデルを作成（リッジ付き最小二乗法）"""
+    fill_values = {"Age": float(np.nanmedian(df["Age"]))}
+    for feature in NUMERIC_FEATURES:
+        median = df[feature].median()
+        fill_values[feature] = float(median) if pd.notna(median) else 0.0
+    levels = {
+        feature: sorted(df[feature].dropna().astype(str).unique().tolist())
+        for feature in CATEGORICAL_FEATURES
+    }
+    model = HedonicModel(
+        municipality=municipality,
+        coefficients=np.empty(0),
+        levels=levels,
+        fill_values=fill_values,
+        residual_std=0.0,
+        r_squared=0.0,
+        training_rows=len(df),
+    )
+    X = model.design_matrix(df)
+    y = np.log(df["TradePrice"].to_numpy(dtype=float))
+
+    # 切片以外の係数に罰則をかけるため、正則化項を行として追加して最小二乗法で解く
+    regularization = np.sqrt(penalty) * np.eye(X.shape[1])[1:]
+    coefficients, *_ = np.linalg.lstsq(
+        np.vstack([X, regularization]), np.concatenate([y, np.zeros(X.shape[1] - 1)]), rcond=None
+    )
+    residuals = y - X @ coefficients
+    model.coefficients = coefficients
+    model.residual_std = float(residuals.std())
+    model.r_squared = float(1 - residuals.var() / y.var())
+    return model
+
+
+class HedonicValuation:
+    """市区町村ごとのヘドニック回帰モデルで物件価格を推定するクラス"""
+
+    def __init__(self, models: Dict[str, HedonicModel], latest_quarter: Optional[str]):
+        self.models = models
+        self.latest_quarter = latest_quarter
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> "HedonicValuation":
+        """中古マンション等の取引データから市区町村ごとのモデルを作成"""
+        df = df[(df["TradePrice"] > 0) & (df["Area"] > 0)]
+        latest_quarter = quarter_labels(df["Period"]).max() if len(df) else None
+        df = prepare_features(df, latest_quarter)
+        models = {}
+        for municipality, group in df.groupby("Municipality"):
+            if len(group) < MIN_TRAINING_ROWS:
+                logger.info(f"Skipping {municipality}: only {len(group)} rows")
+                continue
+            models[municipality] = fit_municipality(municipality, group)
+        return cls(models, latest_quarter)
+
+    def summary(self) -> pd.DataFrame:
+        """市区町村ごとのモデルの概要（学習件数・決定係数・残差の標準偏差）"""
+        return pd.DataFrame(
+            [
+                {
+                    "市区町村": model.municipality,
+                    "学習件数": model.training_rows,
+                    "決定係数": model.r_squared,
+                    "残差の標準偏差(log)": model.residual_std,
+                }
+                for model in self.models.values()
+            ]
+        )
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        """物件の取引価格を推定
+
+        Args:
+            df: INPUT_COLUMNSのカラムを持つ物件のデータ（Period・BuildingYear・
+                CoverageRatio・FloorAreaRatio は省略可）
+
+        Returns:
+            pd.DataFrame: 入力にEstimatedPrice・EstimatedPricePerAreaを追加したデータ
+                （モデルのない市区町村の行はNaN）
+        """
+        df = df.reset_index(drop=True)
+        for column in INPUT_COLUMNS:
+            if column not in df:
+                df[column] = np.nan
+        features = prepare_features(df, self.latest_quarter)
+        estimated = np.full(len(df), np.nan)
+        for municipality, index in features.groupby("Municipality").groups.items():
+            model = self.models.get(municipality)
+            if model is not None:
+                estimated[index] = model.predict(features.loc[index])
+        result = df.copy()
+        result["EstimatedPrice"] = estimated
+        result["EstimatedPricePerArea"] = estimated / features["Area"].to_numpy(dtype=float)
+        return result
+
+    def score_with_throughput(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, float]:
+        """物件の取引価格を推定し、処理件数/秒も返す"""
+        started_at = time.perf_counter()
+        result = self.score(df)
+        seconds = time.perf_counter() - started_at
+        return result, len(df) / seconds if seconds > 0 else float(len(df))
+
+
+@st.cache_resource(max_entries=1)
+def _fit_valuation(data_version: Optional[str]) -> HedonicValuation:
+    """データのバージョンごとにモデルを作成"""
+    started_at = time.perf_counter()
+    training = (
+        get_data_store()
+        .relation("used_mansions")
+        .project(", ".join(INPUT_COLUMNS + ["TradePrice"]))
+        .df()
+    )
+    valuation = HedonicValuation.fit(training)
+    logger.info(
+        f"Fitted {len(valuation.models)} hedonic models on {len(training)} rows "
+        f"in {time.perf_counter() - started_at:.2f}s (data version: {data_version})"
+    )
+    return valuation
+
+
+def get_valuation() -> HedonicValuation:
+    """現在のデータに対応する物件価格の推定モデルを取得"""
+    return _fit_valuation(file_version(DATA_FILE))
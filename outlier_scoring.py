@@ -0,0 +1,62 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+OUTLIER_THRESHOLD = 3.5  # これを超える頑健なzスコアの絶対値を外れ値とみなす
+MIN_GROUP_SIZE = 5  # 外れ値を判定するグループの最小件数（これ未満のグループは判定しない）
+MAD_SCALE = 0.6745  # 正規分布でMADを標準偏差に揃えるための係数
+
+
+def robust_z_score_sql(source: str, value: str, groups: Sequence[str]) -> str:
+    """グループごとの中央値・MADから頑健なzスコアと外れ値フラグを付与するSQLを作成
+
+    中央値・MADはウィンドウ関数で求めるため、1回のクエリで全グループを判定する。
+    件数がMIN_GROUP_SIZE未満またはMADが0のグループの行はスコアをNULL、フラグをfalseとする。
+
+    Args:
+        source: 判定対象の行を返すSQL
+        value: 判定に使用するカラム
+        groups: グループを表すカラム
+
+    Returns:
+        str: 元のカラムにOutlierScore・IsOutlierを追加した行を返すSQL
+    """
+    partition = f"PARTITION BY {', '.join(groups)}"
+    return f"""
+        WITH centered AS (
+            SELECT *,
+                MEDIAN({value}) OVER ({partition}) AS __median,
+                COUNT({value}) OVER ({partition}) AS __group_size
+            FROM ({source})
+        ),
+        scored AS (
+            SELECT *, MEDIAN(abs({value} - __median)) OVER ({partition}) AS __mad
+            FROM centered
+        )
+        SELECT * EXCLUDE (__median, __group_size, __mad),
+            CASE WHEN __group_size >= {MIN_GROUP_SIZE} AND __mad > 0
+                THEN {MAD_SCALE} * ({value} - __median) / __mad
+            END AS OutlierScore,
+            COALESCE(abs(OutlierScore) > {OUTLIER_THRESHOLD}, false) AS IsOutlier
+        FROM scored
+    """
+
+
+def robust_z_scores(df: pd.DataFrame, value: str, groups: Sequence[str]) -> pd.Series:
+    """グループごとの中央値・MADから頑健なzスコアを計算（robust_z_score_sqlと同じ判定）"""
+    grouped = df.groupby(list(groups), dropna=False)[value]
+    median = grouped.transform("median")
+    deviation = (df[value] - median).abs()
+    mad = deviation.groupby([df[group] for group in groups], dropna=False).transform("median")
+    group_size = grouped.transform("count")
+    valid = (group_size >= MIN_GROUP_SIZE) & (mad > 0)
+    return (MAD_SCALE * (df[value] - median) / mad).where(valid, np.nan)
+
+
+def flag_outliers(df: pd.DataFrame, value: str, groups: Sequence[str]) -> pd.DataFrame:
+    """頑健なzスコア（outlier_score）と外れ値フラグ（is_outlier）を追加したDataFrameを返す"""
+    df = df.copy()
+    df["outlier_score"] = robust_z_scores(df, value, groups)
+    df["is_outlier"] = df["outlier_score"].abs() > OUTLIER_THRESHOLD
+    return df
@@ -0,0 +1,76 @@
+import duckdb
+
+from data_store import get_data_store
+
+# 比較する値（カラム: 表示名）
+COMPARISON_METRICS = {
+    "median_trade_price": "取引価格の中央値",
+    "volume": "取引件数",
+    "unit_price": "面積単価の中央値",
+}
+# 比較する期間（接尾辞: (何四半期前と比較するか, 表示名)）
+COMPARISON_LAGS = {
+    "qoq": (1, "前期比"),
+    "yoy": (4, "前年同期比"),
+}
+
+
+def period_comparison_sql(source_sql: str, exclude_outliers: bool = False) -> str:
+    """地区・四半期ごとの前期比・前年同期比を計算するSQLを生成
+
+    全地区・全四半期の比較を、同じ並び順のウィンドウ関数による1回の走査で計算する。
+    比較元はRANGEフレームで四半期の番号がちょうどN四半期前の行とするため、
+    その四半期に取引がない場合（系列の欠け）は比較値・変化率がNULLになる。
+    外れ値を除外する場合は外れ値以外の取引の件数・中央値（inlier_*）を使い、
+    外れ値以外の取引がない四半期は取引がない四半期として扱う。
+
+    - {metric}: 当期の値（COMPARISON_METRICSの各値）
+    - {metric}_{lag}: 比較元の四半期の値（lagはCOMPARISON_LAGSの接尾辞）
+    - {metric}_{lag}_change: 比較元からの変化率
+
+    Args:
+        source_sql: district_quarter_statsと同じカラムを持つ地区・四半期集計のSQL
+        exclude_outliers: 外れ値（IsOutlier）を除いた件数・中央値で比較するかどうか
+
+    Returns:
+        str: Municipality, DistrictName, Period と上記の値を返すSQL（行の順序は不定）
+    """
+    comparisons = []
+    windows = []
+    for lag, (quarters, _) in COMPARISON_LAGS.items():
+        for metric in COMPARISON_METRICS:
+            comparisons += [
+                f"FIRST_VALUE({metric}) OVER {lag} AS {metric}_{lag}",
+                f"{metric} / FIRST_VALUE({metric}) OVER {lag} - 1 AS {metric}_{lag}_change",
+            ]
+        windows.append(
+            f"{lag} AS (PARTITION BY Municipality, DistrictName ORDER BY quarter_index "
+            f"RANGE BETWEEN {quarters} PRECEDING AND {quarters} PRECEDING)"
+        )
+    select = ",\n            ".join(list(COMPARISON_METRICS) + comparisons)
+    prefix = "inlier_" if exclude_outliers else ""
+    count_column = "inlier_count" if exclude_outliers else "count"
+    return f"""
+        WITH quarters AS (
+            SELECT Municipality, DistrictName, Period,
+                {prefix}median_trade_price AS median_trade_price,
+                {count_column} AS volume,
+                {prefix}median_price_per_area AS unit_price,
+                year(Period) * 4 + quarter(Period) - 1 AS quarter_index
+            FROM ({source_sql})
+            WHERE {count_column} > 0
+        )
+        SELECT Municipality, DistrictName, Period,
+            {select}
+        FROM quarters
+        WINDOW {", ".join(windows)}
+    """
+
+
+def period_comparison_relation(
+    district_stats: duckdb.DuckDBPyRelation, exclude_outliers: bool = False
+) -> duckdb.DuckDBPyRelation:
+    """地区・四半期集計のrelationから前期比・前年同期比のrelationを作成（実行はしない）"""
+    return get_data_store().cursor().sql(
+        period_comparison_sql(district_stats.sql_query(), exclude_outliers)
+    )
@@ -0,0 +1,59 @@
+import duckdb
+
+from data_store import get_data_store
+
+SMOOTHING_QUARTERS = 4  # 平滑化に使用する四半期数（当期を含む）
+BASE_INDEX = 100  # 各地区の最初の四半期の指数
+
+
+def price_index_sql(source_sql: str, window: int = SMOOTHING_QUARTERS) -> str:
+    """地区・四半期ごとの面積単価の価格指数を計算するSQLを生成
+
+    全地区の系列をウィンドウ関数で一度に計算する（結果の行の順序は不定）。
+
+    - median_price: 四半期の面積単価の中央値
+    - smoothed_price: 直近window四半期の中央値を取引件数で加重平均した値
+    - qoq_change: 前四半期からの中央値の変化率（前四半期のデータがない場合はNULL）
+    - price_index: smoothed_priceを地区の最初の四半期を100として指数化した値
+
+    Args:
+        source_sql: district_quarter_statsと同じカラムを持つ地区・四半期集計のSQL
+        window: 平滑化に使用する四半期数（当期を含む）
+
+    Returns:
+        str: Municipality, DistrictName, Period, volume, median_price,
+            smoothed_price, qoq_change, price_index を返すSQL
+    """
+    # 指数の基準（最初の四半期の平滑化値）は最初の四半期の中央値と等しいため、
+    # 同じ並び順のウィンドウのFIRST_VALUEで求めて追加の並べ替えを避ける
+    smoothed_price = "SUM(median_price * volume) OVER recent / SUM(volume) OVER recent"
+    return f"""
+        WITH quarters AS (
+            SELECT Municipality, DistrictName, Period,
+                count AS volume,
+                median_price_per_area AS median_price,
+                year(Period) * 4 + quarter(Period) - 1 AS quarter_index
+            FROM ({source_sql})
+            WHERE median_price_per_area IS NOT NULL
+        )
+        SELECT Municipality, DistrictName, Period, volume, median_price,
+            {smoothed_price} AS smoothed_price,
+            CASE WHEN LAG(quarter_index) OVER series = quarter_index - 1
+                THEN median_price / LAG(median_price) OVER series - 1
+            END AS qoq_change,
+            {BASE_INDEX} * ({smoothed_price}) / FIRST_VALUE(median_price) OVER series AS price_index
+        FROM quarters
+        WINDOW
+            series AS (PARTITION BY Municipality, DistrictName ORDER BY quarter_index),
+            recent AS (
+                PARTITION BY Municipality, DistrictName ORDER BY quarter_index
+                RANGE BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW
+            )
+    """
+
+
+def price_index_relation(
+    district_stats: duckdb.DuckDBPyRelation, window: int = SMOOTHING_QUARTERS
+) -> duckdb.DuckDBPyRelation:
+    """地区・四半期集計のrelationから価格指数のrelationを作成（実行はしない）"""
+    return get_data_store().cursor().sql(price_index_sql(district_stats.sql_query(), window))
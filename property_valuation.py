@@ -0,0 +1,90 @@
+import pandas as pd
+import streamlit as st
+
+from base_analyzer import BaseAnalyzer
+from hedonic_model import get_valuation
+
+# 一括推定のCSVに必須のカラム
+REQUIRED_COLUMNS = ["Municipality", "DistrictName", "Area", "FloorPlan", "Structure"]
+
+
+class ValuationAnalyzer(BaseAnalyzer):
+    """ヘドニック回帰による物件価格の推定クラス"""
+
+    def _render_single_valuation(self, valuation):
+        """1件の物件の条件を入力して価格を推定"""
+        st.subheader("1件の物件を推定")
+        municipality = st.selectbox("市区町村", options=list(valuation.models))
+        levels = valuation.models[municipality].levels
+        col1, col2 = st.columns(2)
+        district = col1.selectbox("地区名", options=levels["DistrictName"])
+        floor_plan = col2.selectbox("間取り", options=levels["FloorPlan"])
+        structure = col1.selectbox("建物の構造", options=levels["Structure"])
+        area = col2.number_input("面積（平方メートル）", min_value=1.0, value=60.0, step=1.0)
+        building_year = col1.number_input("建築年", min_value=1900, max_value=2100, value=2005, step=1)
+        coverage_ratio = col2.number_input("建蔽率（%）", min_value=0.0, value=None, step=10.0)
+        floor_area_ratio = col1.number_input("容積率（%）", min_value=0.0, value=None, step=10.0)
+
+        candidate = pd.DataFrame([{
+            "Municipality": municipality,
+            "DistrictName": district,
+            "Area": area,
+            "BuildingYear": building_year,
+            "FloorPlan": floor_plan,
+            "Structure": structure,
+            "CoverageRatio": coverage_ratio,
+            "FloorAreaRatio": floor_area_ratio,
+        }])
+        result = valuation.score(candidate).iloc[0]
+        col_price, col_unit = st.columns(2)
+        col_price.metric("推定取引価格", f"{result['EstimatedPrice'] / 10000:,.0f}万円")
+        col_unit.metric("平方メートル単価", f"{result['EstimatedPricePerArea'] / 10000:,.1f}万円")
+        st.caption(f"{valuation.latest_quarter}の取引として推定しています。")
+
+    def _render_batch_valuation(self, valuation):
+        """CSVの物件をまとめて推定"""
+        st.subheader("CSVの物件をまとめて推定")
+        st.write(
+            f"必須カラム: {', '.join(REQUIRED_COLUMNS)}"
+            "（BuildingYear, Period, CoverageRatio, FloorAreaRatio は省略可）"
+        )
+        uploaded = st.file_uploader("物件のCSVファイル", type="csv")
+        if uploaded is None:
+            return
+
+        candidates = pd.read_csv(uploaded)
+        missing = [column for column in REQUIRED_COLUMNS if column not in candidates.columns]
+        if missing:
+            st.error(f"CSVに必須のカラムがありません: {', '.join(missing)}")
+            return
+
+        result, rows_per_second = valuation.score_with_throughput(candidates)
+        unscored = int(result["EstimatedPrice"].isna().sum())
+        st.write(f"{len(result):,}件を推定しました（{rows_per_second:,.0f}件/秒）")
+        if unscored:
+            st.warning(f"モデルのない市区町村などのため、{unscored:,}件は推定できませんでした。")
+        st.dataframe(result.head(1000))
+        st.download_button(
+            "推定結果をダウンロード",
+            data=result.to_csv(index=False).encode("utf-8-sig"),
+            file_name="valuation_results.csv",
+            mime="text/csv",
+        )
+
+    def run(self):
+        """物件価格の推定の実行"""
+        st.title("物件価格の推定")
+        st.write("中古マンション等の取引データから市区町村ごとに作成したヘドニック回帰モデルで価格を推定します。")
+
+        if self._load_data("used_mansions") is None:
+            return
+        valuation = get_valuation()
+        if not valuation.models:
+            st.info("推定に必要な件数の取引データがありません。")
+            return
+
+        with st.expander("モデルの概要"):
+            st.dataframe(valuation.summary())
+
+        self._render_single_valuation(valuation)
+        self._render_batch_valuation(valuation)
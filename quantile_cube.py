@@ -0,0 +1,208 @@
+from math import log, sqrt
+from typing import List, Optional, Sequence
+
+import duckdb
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.basedatatypes import BaseTraceType
+
+from data_store import get_data_store
+
+MAX_OUTLIERS = 50  # グループごとに描画する外れ値の最大数
+WHISKER_RATIO = 1.5  # ひげの長さ（四分位範囲に対する倍率）
+SAMPLE_SIZE = 8192  # 近似モードでグループごとに保持する標本数（これ以下の件数のグループは厳密に計算）
+CONFIDENCE = 0.99  # 近似誤差の上限を保証する信頼度
+# 近似モードの分位点の順位誤差の上限（DKW不等式による。標本数SAMPLE_SIZEで信頼度CONFIDENCE）
+APPROX_RANK_ERROR = sqrt(log(2 / (1 - CONFIDENCE)) / (2 * SAMPLE_SIZE))
+
+
+def _join_condition(left: str, right: str, group_columns: Sequence[str]) -> str:
+    """グループのカラムで結合する条件（NULLも同じグループとして扱う）"""
+    return " AND ".join(
+        f"{left}.{column} IS NOT DISTINCT FROM {right}.{column}" for column in group_columns
+    )
+
+
+def _exact_summary_sql(source: str, group_columns: Sequence[str], value_column: str, max_outliers: int) -> str:
+    """sourceの全行から箱ひげ図の統計量を厳密に集計するSQL"""
+    groups = ", ".join(group_columns)
+    return f"""
+        WITH stats AS (
+            SELECT {groups}, COUNT(*) AS count,
+                quantile_cont({value_column}, [0.25, 0.5, 0.75]) AS quartiles
+            FROM {source} WHERE {value_column} IS NOT NULL
+            GROUP BY {groups}
+        ),
+        fenced AS (
+            SELECT {", ".join(f"stats.{column}" for column in group_columns)},
+                stats.count, src.{value_column} AS value,
+                quartiles[1] AS q1, quartiles[2] AS median, quartiles[3] AS q3,
+                quartiles[1] - {WHISKER_RATIO} * (quartiles[3] - quartiles[1]) AS lower_limit,
+                quartiles[3] + {WHISKER_RATIO} * (quartiles[3] - quartiles[1]) AS upper_limit
+            FROM {source} AS src JOIN stats ON {_join_condition("src", "stats", group_columns)}
+            WHERE src.{value_column} IS NOT NULL
+        )
+        SELECT {groups}, ANY_VALUE(count) AS count,
+            ANY_VALUE(q1) AS q1, ANY_VALUE(median) AS median, ANY_VALUE(q3) AS q3,
+            MIN(value) FILTER (WHERE value >= lower_limit) AS lowerfence,
+            MAX(value) FILTER (WHERE value <= upper_limit) AS upperfence,
+            COALESCE(list_slice(
+                list(value ORDER BY abs(value - median) DESC)
+                    FILTER (WHERE value < lower_limit OR value > upper_limit),
+                1, {int(max_outliers)}
+            ), []) AS outliers
+        FROM fenced
+        GROUP BY {groups}
+    """
+
+
+def _approximate_summary_sql(group_columns: Sequence[str], value_column: str, max_outliers: int) -> str:
+    """件数の多いグループを標本から近似し、少ないグループは厳密に集計するSQL
+
+    件数がSAMPLE_SIZEを超えるグループは、1回の走査で得た標本の四分位数と最小値・最大値から
+    箱ひげ図を作る（ひげは四分位範囲の1.5倍で打ち切り、外れ値は最小値・最大値のみ）。
+    """
+    groups = ", ".join(group_columns)
+    exact_sql = _exact_summary_sql("small_src", group_columns, value_column, max_outliers)
+    return f"""
+        WITH sketch AS (
+            SELECT {groups}, COUNT(*) AS count,
+                reservoir_quantile({value_column}, [0.25, 0.5, 0.75], {SAMPLE_SIZE}) AS quartiles,
+                MIN({value_column}) AS min_value, MAX({value_column}) AS max_value
+            FROM src WHERE {value_column} IS NOT NULL
+            GROUP BY {groups}
+        ),
+        small_src AS (
+            SELECT src.* FROM src SEMI JOIN (
+                SELECT {groups} FROM sketch WHERE count <= {SAMPLE_SIZE}
+            ) AS small ON {_join_condition("src", "small", group_columns)}
+        ),
+        large AS (
+            SELECT {groups}, count, min_value, max_value,
+                quartiles[1] AS q1, quartiles[2] AS median, quartiles[3] AS q3,
+                quartiles[1] - {WHISKER_RATIO} * (quartiles[3] - quartiles[1]) AS lower_limit,
+                quartiles[3] + {WHISKER_RATIO} * (quartiles[3] - quartiles[1]) AS upper_limit
+            FROM sketch WHERE count > {SAMPLE_SIZE}
+        )
+        SELECT {groups}, count, q1, median, q3,
+            GREATEST(min_value, lower_limit) AS lowerfence,
+            LEAST(max_value, upper_limit) AS upperfence,
+            list_filter([min_value, max_value], x -> x < lower_limit OR x > upper_limit) AS outliers
+        FROM large
+        UNION ALL BY NAME
+        ({exact_sql})
+    """
+
+
+def box_summary_relation(
+    rel: duckdb.DuckDBPyRelation,
+    group_columns: Sequence[str],
+    value_column: str,
+    max_outliers: int = MAX_OUTLIERS,
+    approximate: bool = False,
+) -> duckdb.DuckDBPyRelation:
+    """グループごとの箱ひげ図の統計量をDuckDBで集計するrelationを作成
+
+    四分位数は全行から厳密に計算し、ひげは四分位範囲の1.5倍以内にある最小値・最大値とする。
+    外れ値は中央値から遠い順に最大max_outliers件だけを返すため、
+    結果のサイズは行数ではなくグループ数に比例する。
+    approximateを指定した場合、件数がSAMPLE_SIZEを超えるグループの四分位数は
+    標本から近似する（順位誤差はAPPROX_RANK_ERROR以内）。
+
+    Args:
+        rel: 集計対象のrelation
+        group_columns: グループ化するカラム
+        value_column: 集計する値のカラム
+        max_outliers: グループごとに返す外れ値の最大数
+        approximate: 件数の多いグループを近似計算する場合はTrue
+
+    Returns:
+        duckdb.DuckDBPyRelation: グループのカラムと count, q1, median, q3,
+            lowerfence, upperfence, outliers（外れ値のリスト）を持つrelation
+    """
+    if approximate:
+        summary_sql = _approximate_summary_sql(group_columns, value_column, max_outliers)
+    else:
+        summary_sql = _exact_summary_sql("src", group_columns, value_column, max_outliers)
+    sql = f"""
+        WITH src AS ({rel.sql_query()})
+        SELECT * FROM ({summary_sql})
+        ORDER BY {", ".join(group_columns)}
+    """
+    return get_data_store().cursor().sql(sql)
+
+
+def box_traces(
+    summary: pd.DataFrame,
+    x_column: str,
+    name: Optional[str] = None,
+) -> List[BaseTraceType]:
+    """集計済みの統計量から箱ひげ図と外れ値のトレースを作成
+
+    Args:
+        summary: box_summary_relationの結果
+        x_column: x軸に使用するカラム
+        name: 凡例に表示する名前
+
+    Returns:
+        List[BaseTraceType]: 箱ひげ図のトレースと外れ値の散布図のトレース
+    """
+    x = summary[x_column].tolist()
+    traces = [
+        go.Box(
+            x=x,
+            q1=summary["q1"],
+            median=summary["median"],
+            q3=summary["q3"],
+            lowerfence=summary["lowerfence"],
+            upperfence=summary["upperfence"],
+            name=name,
+            legendgroup=name,
+            offsetgroup=name,
+            boxpoints=False,
+        )
+    ]
+    outlier_x = []
+    outlier_y = []
+    for group, outliers in zip(x, summary["outliers"]):
+        outlier_x.extend([group] * len(outliers))
+        outlier_y.extend(outliers)
+    if outlier_y:
+        traces.append(
+            go.Scatter(
+                x=outlier_x,
+                y=outlier_y,
+                mode="markers",
+                name=name,
+                legendgroup=name,
+                showlegend=False,
+                offsetgroup=name,
+                marker={"symbol": "circle-open", "size": 5},
+            )
+        )
+    return traces
+
+
+def box_figure(
+    summary: pd.DataFrame,
+    x_column: str,
+    color_column: Optional[str] = None,
+    title: Optional[str] = None,
+    y_title: Optional[str] = None,
+) -> go.Figure:
+    """集計済みの統計量から箱ひげ図を作成（color_columnを指定した場合は値ごとに色分け）"""
+    fig = go.Figure()
+    if color_column is None:
+        fig.add_traces(box_traces(summary, x_column))
+    else:
+        for name, group in summary.groupby(color_column, sort=False):
+            fig.add_traces(box_traces(group, x_column, name=str(name)))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_column,
+        yaxis_title=y_title,
+        boxmode="group",
+        scattermode="group",
+        showlegend=color_column is not None,
+    )
+    return fig
@@ -0,0 +1,93 @@
+from typing import Dict, List, Tuple
+
+import duckdb
+import pandas as pd
+
+from data_store import get_data_store
+
+_GROUPING_COLUMN = "__grouping_id"
+
+
+class QueryBatch:
+    """同じrelationに対する複数の集計をGROUPING SETSで1回の走査にまとめるクラス
+
+    add_groupで登録したカラムの組ごとの件数・集計値と、add_aggregateで登録した
+    全体の集計値を1つのクエリで求め、結果をBatchResultで登録した単位に振り分ける。
+    """
+
+    def __init__(self, rel: duckdb.DuckDBPyRelation):
+        """
+        Args:
+            rel: 集計対象のrelation
+        """
+        self.rel = rel
+        self._groups: List[Tuple[str, ...]] = []
+        self._aggregates: Dict[str, str] = {}
+
+    def add_group(self, *columns: str) -> "QueryBatch":
+        """カラムの組ごとの集計を登録（同じ組は1回だけ集計する）"""
+        if columns not in self._groups:
+            self._groups.append(columns)
+        return self
+
+    def add_aggregate(self, alias: str, expression: str) -> "QueryBatch":
+        """集計式を登録（登録したすべての組と全体に対して計算される）"""
+        self._aggregates[alias] = expression
+        return self
+
+    def _columns(self) -> List[str]:
+        """集計に使用するカラムの一覧（登録順、重複なし）"""
+        return list(dict.fromkeys(column for group in self._groups for column in group))
+
+    def relation(self) -> duckdb.DuckDBPyRelation:
+        """登録した集計をまとめて行うrelationを作成（実行はしない）"""
+        columns = self._columns()
+        grouping_sets = [f"({', '.join(group)})" for group in self._groups] + ["()"]
+        select = columns + [
+            f"GROUPING({', '.join(columns)}) AS {_GROUPING_COLUMN}" if columns else f"0 AS {_GROUPING_COLUMN}",
+            "COUNT(*) AS count",
+        ] + [f"{expression} AS {alias}" for alias, expression in self._aggregates.items()]
+        sql = (
+            f"SELECT {', '.join(select)} FROM ({self.rel.sql_query()}) "
+            f"GROUP BY GROUPING SETS ({', '.join(grouping_sets)})"
+        )
+        return get_data_store().cursor().sql(sql)
+
+    def result(self, df: pd.DataFrame) -> "BatchResult":
+        """relationの実行結果を登録した単位に振り分けるBatchResultを作成"""
+        return BatchResult(df, self._groups, list(self._aggregates))
+
+
+class BatchResult:
+    """QueryBatchの実行結果"""
+
+    def __init__(self, df: pd.DataFrame, groups: List[Tuple[str, ...]], aggregates: List[str]):
+        self._df = df
+        self._groups = groups
+        self._columns = list(dict.fromkeys(column for group in groups for column in group))
+        self._aggregates = aggregates
+
+    def _grouping_id(self, group: Tuple[str, ...]) -> int:
+        """GROUPING()の値（集計に含まれないカラムのビットが1）"""
+        n = len(self._columns)
+        return sum(
+            1 << (n - 1 - i) for i, column in enumerate(self._columns) if column not in group
+        )
+
+    def group(self, *columns: str) -> pd.DataFrame:
+        """カラムの組ごとの集計結果（組のカラム・count・集計値）を取得"""
+        rows = self._df[self._df[_GROUPING_COLUMN] == self._grouping_id(columns)]
+        return rows[list(columns) + ["count"] + self._aggregates].reset_index(drop=True)
+
+    def distinct(self, column: str) -> list:
+        """カラムのユニークな値をソート済みで取得（NULLを除く）
+
+        カラムを含む登録済みの組のうち最初のものの集計結果から求める。
+        """
+        group = next(group for group in self._groups if column in group)
+        return sorted(self.group(*group)[column].dropna().unique().tolist())
+
+    def total(self, alias: str = "count"):
+        """全体の集計値を取得"""
+        rows = self._df[self._df[_GROUPING_COLUMN] == self._grouping_id(())]
+        return rows[alias].iloc[0]
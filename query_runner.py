@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Tuple, TypeVar
+
+import duckdb
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from data_store import DataStore, get_data_store
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_QUERY_WORKERS = 4  # 同時に実行するクエリ数の上限
+QUERY_TIMEOUT = 60.0  # クエリのタイムアウト（秒）
+PROGRESS_DELAY = 0.5  # 進捗表示を出すまでの時間（秒）
+
+
+class QueryRunner:
+    """DuckDBのクエリをワーカースレッドで実行し、不要になったクエリを中断するクラス
+
+    クエリごとに専用のカーソルを使うため、中断（interrupt）は対象のクエリにのみ作用する。
+    同じセッション・同じ用途（slot）のクエリが新たに投入された場合や、
+    入力の変更でStreamlitの再実行が始まった場合は実行中のクエリを中断する。
+    """
+
+    def __init__(self, store: DataStore, max_workers: int = MAX_QUERY_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-worker")
+        self._running: Dict[Tuple[str, str], Tuple[Future, duckdb.DuckDBPyConnection]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _session_id() -> str:
+        """実行中のStreamlitセッションのIDを取得"""
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else "default"
+
+    def _submit(
+        self, key: Tuple[str, str], fn: Callable[[duckdb.DuckDBPyConnection], T]
+    ) -> Tuple[Future, duckdb.DuckDBPyConnection]:
+        """同じキーの実行中クエリを中断してから新しいクエリを投入"""
+        cursor = self.store.new_cursor()
+        with self._lock:
+            previous = self._running.pop(key, None)
+            if previous is not None and not previous[0].done():
+                logger.info(f"Interrupting superseded query: {key[1]}")
+                previous[0].cancel()
+                previous[1].interrupt()
+            future = self._executor.submit(fn, cursor)
+            self._running[key] = (future, cursor)
+        future.add_done_callback(lambda _: cursor.close())
+        return future, cursor
+
+    def run(
+        self,
+        slot: str,
+        fn: Callable[[duckdb.DuckDBPyConnection], T],
+        timeout: float = QUERY_TIMEOUT,
+    ) -> T:
+        """クエリを実行して結果を取得（実行に時間がかかる場合は進捗を表示）
+
+        Args:
+            slot: クエリの用途（同じセッション・同じ用途の古いクエリは中断される）
+            fn: 渡されたカーソルでクエリを実行して結果を返す関数
+            timeout: タイムアウト（秒）
+
+        Raises:
+            TimeoutError: タイムアウトした場合
+        """
+        key = (self._session_id(), slot)
+        future, cursor = self._submit(key, fn)
+        started_at = time.monotonic()
+        placeholder = None
+        try:
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except TimeoutError:
+                    pass
+                elapsed = time.monotonic() - started_at
+                if elapsed > timeout:
+                    cursor.interrupt()
+                    raise TimeoutError(f"クエリが{timeout:.0f}秒以内に完了しませんでした")
+                if elapsed > PROGRESS_DELAY:
+                    if placeholder is None:
+                        placeholder = st.empty()
+                    placeholder.progress(
+                        self._progress(cursor, elapsed, timeout),
+                        text=f"集計中...（{elapsed:.1f}秒）",
+                    )
+        finally:
+            # 再実行などで待機が打ち切られた場合もクエリを残さない
+            if not future.done():
+                future.cancel()
+                cursor.interrupt()
+            with self._lock:
+                if self._running.get(key, (None,))[0] is future:
+                    del self._running[key]
+            if placeholder is not None:
+                placeholder.empty()
+
+    @staticmethod
+    def _progress(cursor: duckdb.DuckDBPyConnection, elapsed: float, timeout: float) -> float:
+        """進捗率（0〜1）を取得（DuckDBが進捗を返さない場合は経過時間から算出）"""
+        query_progress = getattr(cursor, "query_progress", None)
+        if query_progress is not None:
+            progress = query_progress()
+            if progress >= 0:
+                return min(progress / 100, 1.0)
+        return min(elapsed / timeout, 1.0)
+
+    def fetch_df(self, slot: str, rel: duckdb.DuckDBPyRelation, timeout: float = QUERY_TIMEOUT):
+        """relationの結果をDataFrameとして取得"""
+        sql = rel.sql_query()
+        return self.run(slot, lambda cursor: cursor.sql(sql).df(), timeout)
+
+
+@st.cache_resource
+def get_query_runner() -> QueryRunner:
+    """アプリ全体で共有するQueryRunnerを取得"""
+    return QueryRunner(get_data_store())
@@ -0,0 +1,36 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """トークンバケット方式でAPIリクエストの頻度を制限するクラス"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: 1秒あたりに補充されるトークン数
+            burst: バケットに貯められるトークンの上限
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """経過時間に応じてトークンを補充（ロック取得済みの状態で呼び出す）"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self) -> None:
+        """トークンを1つ取得するまで待機"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
@@ -1,8 +1,10 @@
 import json
 import logging
 import os
+import threading
 import time
 import unicodedata
+from concurrent.futures import Future
 from dataclasses import dataclass, field
 from itertools import product
 from math import atan, cos, degrees, floor, log, pi, radians, sin, sinh, tan
@@ -15,6 +17,13 @@ import requests
 import streamlit as st
 from requests.exceptions import RequestException
 
+from api_scheduler import Priority, get_scheduler
+from catalog import build_catalog, save_catalog
+from data_store import file_version
+from derived_tables import build_derived_tables
+from district_index import DistrictIndex, save_index
+from outlier_scoring import flag_outliers
+
 # ロギングの設定
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +40,16 @@ class DataConfig:
     )
     API_URL: str = "https://www.reinfolib.mlit.go.jp/ex-api/external/XIT001"
     GEOJSON_API_URL: str = "https://www.reinfolib.mlit.go.jp/ex-api/external/XPT001"
+    TILE_CACHE_DIR: Path = field(
+        default_factory=lambda: Path(__file__).parent / "data" / "tile_cache"
+    )
+    TILE_CACHE_TTL: int = 24 * 60 * 60  # タイルキャッシュの有効期間（秒）
+    MAX_FETCH_WORKERS: int = 8  # APIリクエストを並列実行するスレッド数
+    MAX_POLYGON_TILES: int = 500  # ポリゴン検索で取得するタイル数の上限
+    API_RATE_LIMIT: float = 5.0  # APIリクエストの上限（回/秒）
+    API_RATE_BURST: int = 10  # 連続して送信できるリクエスト数
+    PREFETCH_MAX_WAIT: float = 30.0  # 先読みリクエストの待ち時間の上限（秒）
+    BULK_MAX_WAIT: float = 60.0  # 一括ダウンロードリクエストの待ち時間の上限（秒）
     
     CITIES: List[str] = field(default_factory=lambda: [
         "13102",  # 中央区
@@ -60,6 +79,7 @@ class DataDownloader:
     def __init__(self, config: DataConfig = DataConfig()):
         self.config = config
         self.subscription_key = self._get_subscription_key()
+        self.scheduler = get_scheduler(config)
         self.config.RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     @staticmethod
@@ -95,9 +115,11 @@ class DataDownloader:
                 
             try:
                 logger.info(f"Downloading data for year: {year}, city: {city}")
-                df = self.get_data(year=year, city=city)
+                # 画面操作による検索を優先させるため低優先度で実行
+                df = self.scheduler.submit(
+                    Priority.BULK, self.get_data, year=year, city=city
+                ).result()
                 df.to_parquet(output_file)
-                time.sleep(2)
             except Exception as e:
                 logger.error(f"Failed to download data for year {year}, city {city}: {e}")
 
@@ -144,15 +166,55 @@ class DataFormatter:
             final_file = self.config.BASE_DIR / "data.parquet"
             formatted_df.to_parquet(final_file)
             logger.info(f"Formatted data saved to {final_file}")
+
+            # 検索画面の選択肢・範囲をデータから作成してデータと並べて保存
+            data_version = file_version(final_file)
+            save_catalog(build_catalog(formatted_df, data_version), final_file)
+
+            # 地区名・市区町村名のあいまい検索用の索引を作成
+            save_index(DistrictIndex.build_index(formatted_df, data_version), final_file)
+
+            # 分析画面で使用する派生テーブル（中古マンション・地区四半期・市区町村の集計）を作成
+            build_derived_tables(final_file, data_version)
         except Exception as e:
             logger.error(f"Error formatting data: {e}")
             raise
 
+class TileCache:
+    """GeoJSONタイルをローカルファイルにキャッシュするクラス"""
+    def __init__(self, config: DataConfig = DataConfig()):
+        self.config = config
+        self.config.TILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, x: int, y: int, zoom: int, from_date: int, to_date: int) -> Path:
+        """キャッシュファイルのパスを取得"""
+        return self.config.TILE_CACHE_DIR / str(zoom) / str(x) / f"{y}_{from_date}_{to_date}.json"
+
+    def get(self, x: int, y: int, zoom: int, from_date: int, to_date: int) -> Optional[dict]:
+        """有効期間内のキャッシュがあれば取得"""
+        path = self._path(x, y, zoom, from_date, to_date)
+        try:
+            if time.time() - path.stat().st_mtime > self.config.TILE_CACHE_TTL:
+                return None
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, x: int, y: int, zoom: int, from_date: int, to_date: int, geojson: dict) -> None:
+        """キャッシュを保存（書き込み途中のファイルを読まれないよう置き換えで保存）"""
+        path = self._path(x, y, zoom, from_date, to_date)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(geojson, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
 class GeoJsonDownloader:
     """地理データのダウンロードを担当するクラス"""
     def __init__(self, config: DataConfig = DataConfig()):
         self.config = config
         self.subscription_key = DataDownloader._get_subscription_key()
+        self.cache = TileCache(config)
+        self.scheduler = get_scheduler(config)
 
     @staticmethod
     def latlon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
@@ -188,28 +250,38 @@ class GeoJsonDownloader:
         north, east = GeoJsonDownloader.tile_to_latlon(x + 1, y, zoom)
         return south, west, north, east
 
-    def get_geojson(
-        self, 
-        lat: float, 
-        lon: float, 
-        zoom: int, 
+    def get_tile_geojson(
+        self,
+        x: int,
+        y: int,
+        zoom: int,
         *,
         from_date: int,
         to_date: int,
     ) -> dict:
-        """指定された座標のGeoJSONデータを取得
-        
-        Args:
-            lat: 緯度
-            lon: 経度
-            zoom: ズームレベル
-            from_date: 開始日（形式：YYYYQ、例：20101は2010年第1四半期）
-            to_date: 終了日（形式：YYYYQ、例：20244は2024年第4四半期）
-        """
+        """タイル座標のGeoJSONデータを取得（キャッシュがあればキャッシュから取得）"""
+        cached = self.cache.get(x, y, zoom, from_date, to_date)
+        if cached is not None:
+            return cached
+
+        return self.scheduler.submit(
+            Priority.INTERACTIVE,
+            self.fetch_tile_geojson,
+            x, y, zoom, from_date=from_date, to_date=to_date,
+        ).result()
+
+    def fetch_tile_geojson(
+        self,
+        x: int,
+        y: int,
+        zoom: int,
+        *,
+        from_date: int,
+        to_date: int,
+    ) -> dict:
+        """APIからタイルのGeoJSONデータを取得してキャッシュに保存（スケジューラ経由で呼び出す）"""
         try:
             headers = {"Ocp-Apim-Subscription-Key": self.subscription_key}
-            x, y = self.latlon_to_tile(lat, lon, zoom)
-            
             params = {
                 "response_format": "geojson",
                 "z": zoom,
@@ -221,11 +293,82 @@ class GeoJsonDownloader:
             
             response = requests.get(self.config.GEOJSON_API_URL, headers=headers, params=params)
             response.raise_for_status()
-            return response.json()
+            geojson = response.json()
         except RequestException as e:
             logger.error(f"Failed to fetch GeoJSON data: {e}")
             raise
 
+        self.cache.put(x, y, zoom, from_date, to_date, geojson)
+        return geojson
+
+    def get_geojson(
+        self, 
+        lat: float, 
+        lon: float, 
+        zoom: int, 
+        *,
+        from_date: int,
+        to_date: int,
+    ) -> dict:
+        """指定された座標のGeoJSONデータを取得
+        
+        Args:
+            lat: 緯度
+            lon: 経度
+            zoom: ズームレベル
+            from_date: 開始日（形式：YYYYQ、例：20101は2010年第1四半期）
+            to_date: 終了日（形式：YYYYQ、例：20244は2024年第4四半期）
+        """
+        x, y = self.latlon_to_tile(lat, lon, zoom)
+        return self.get_tile_geojson(x, y, zoom, from_date=from_date, to_date=to_date)
+
+    def get_geojson_for_tiles(
+        self,
+        tiles: List[Tuple[int, int]],
+        zoom: int,
+        *,
+        from_date: int,
+        to_date: int,
+    ) -> dict:
+        """複数タイルのGeoJSONデータを並列に取得し、1つのFeatureCollectionに結合
+        
+        Args:
+            tiles: (タイルX座標, タイルY座標)のリスト
+            zoom: ズームレベル
+            from_date: 開始日（形式：YYYYQ）
+            to_date: 終了日（形式：YYYYQ）
+        """
+        if len(tiles) > self.config.MAX_POLYGON_TILES:
+            raise ValueError(
+                f"対象タイル数({len(tiles)})が上限({self.config.MAX_POLYGON_TILES})を超えています。"
+                "範囲を狭めるかズームレベルを下げてください。"
+            )
+
+        # キャッシュにないタイルのみをまとめてスケジューラに投入し、並列に取得する
+        results = []
+        for x, y in tiles:
+            cached = self.cache.get(x, y, zoom, from_date, to_date)
+            if cached is not None:
+                results.append(cached)
+                continue
+            results.append(self.scheduler.submit(
+                Priority.INTERACTIVE,
+                self.fetch_tile_geojson,
+                x, y, zoom, from_date=from_date, to_date=to_date,
+            ))
+        try:
+            geojsons = [
+                result.result() if isinstance(result, Future) else result
+                for result in results
+            ]
+        finally:
+            for result in results:
+                if isinstance(result, Future):
+                    result.cancel()
+        features = [feature for geojson in geojsons for feature in geojson.get("features", [])]
+
+        return {"type": "FeatureCollection", "features": features}
+
 class GeoJsonProcessor:
     """GeoJSONデータを処理してDataFrameに変換するクラス"""
     
@@ -274,7 +417,7 @@ class GeoJsonProcessor:
             geojson_data: GeoJSONデータ
             
         Returns:
-            pd.DataFrame: 変換後のDataFrame
+            pd.DataFrame: 変換後のDataFrame（外れ値の判定 outlier_score・is_outlier を含む）
         """
         features = geojson_data.get('features', [])
         processed_data = []
@@ -331,7 +474,11 @@ class GeoJsonProcessor:
             }
             processed_data.append(processed_feature)
             
-        return pd.DataFrame(processed_data)
+        df = pd.DataFrame(processed_data)
+        if df.empty:
+            return df
+        # 地区・時期ごとに単位面積あたりの価格の外れ値を判定
+        return flag_outliers(df, 'price_per_area', ['district', 'period'])
 
 def main() -> None:
     """メイン処理"""
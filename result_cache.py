@@ -0,0 +1,98 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import duckdb
+import streamlit as st
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # キャッシュに保持する結果の合計サイズの上限
+
+
+def estimate_size(value: Any) -> int:
+    """キャッシュする値のおおよそのメモリサイズ（バイト）を推定"""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def relation_fingerprint(rel: duckdb.DuckDBPyRelation) -> str:
+    """relationのSQL（フィルタやprojectionの連なりを含む）から同一性を判定するためのハッシュを生成"""
+    return hashlib.sha256(rel.sql_query().encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """検索結果を保持するメモリサイズ上限付きのLRUキャッシュ
+
+    データのバージョンが変わったら保持している結果をすべて破棄する。
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._current_bytes = 0
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, data_version: str, compute: Callable[[], Any]) -> Any:
+        """キャッシュにあれば結果を返し、なければ計算して保存
+
+        Args:
+            key: 正規化済みの検索条件などから作ったキー
+            data_version: データのバージョン（変わった場合はキャッシュ全体を破棄）
+            compute: キャッシュにない場合に結果を計算する関数
+        """
+        with self._lock:
+            if data_version != self._data_version:
+                self._clear()
+                self._data_version = data_version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            # 計算中にデータが更新された場合や、単体で上限を超える結果は保存しない
+            if data_version != self._data_version or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+        return value
+
+    def _clear(self) -> None:
+        """保持している結果をすべて破棄（ロック取得済みの状態で呼び出す）"""
+        self._entries.clear()
+        self._current_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット率・件数・使用メモリ量を取得"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+            }
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """アプリ全体で共有する結果キャッシュを取得"""
+    return ResultCache()
@@ -0,0 +1,84 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+from data_store import DataStore
+from search_query import CompiledQuery
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = Path(__file__).parent / "data" / "exports"
+MAX_DOWNLOAD_BYTES = 200 * 1024 * 1024  # ダウンロードボタンで渡すファイルサイズの上限
+
+# 出力形式ごとの拡張子とCOPYのオプション
+EXPORT_FORMATS = {
+    "CSV": ("csv", "(FORMAT CSV, HEADER)"),
+    "Parquet": ("parquet", "(FORMAT PARQUET, COMPRESSION ZSTD)"),
+}
+
+
+@dataclass(frozen=True)
+class ExportResult:
+    """エクスポートの結果"""
+    path: Path
+    rows: int
+    bytes: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    @property
+    def megabytes_per_second(self) -> float:
+        megabytes = self.bytes / 1024 / 1024
+        return megabytes / self.seconds if self.seconds > 0 else megabytes
+
+
+def export_path(export_format: str, export_dir: Path = EXPORT_DIR) -> Path:
+    """出力形式に応じたエクスポート先のファイルパスを生成"""
+    extension, _ = EXPORT_FORMATS[export_format]
+    return export_dir / f"search_results_{datetime.now():%Y%m%d_%H%M%S_%f}.{extension}"
+
+
+def export_query(
+    cursor: duckdb.DuckDBPyConnection,
+    query: CompiledQuery,
+    path: Path,
+    export_format: str,
+) -> ExportResult:
+    """検索結果をCOPY (query) TOでDuckDBから直接ファイルに書き出す
+
+    結果はDuckDB内でストリーミングしながら書き込まれ、Pythonのメモリには載せないため、
+    件数が多くてもPython側のメモリ使用量は一定になる。
+
+    Args:
+        cursor: クエリを実行するカーソル
+        query: コンパイル済みの検索条件
+        path: 出力先のファイルパス
+        export_format: 出力形式（EXPORT_FORMATSのキー）
+
+    Returns:
+        ExportResult: 出力先・件数・ファイルサイズ・所要時間
+    """
+    _, options = EXPORT_FORMATS[export_format]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # COPY先のパスはバインド変数にできないため、文字列リテラルとしてエスケープする
+    target = str(path).replace("'", "''")
+    started_at = time.perf_counter()
+    rows = cursor.execute(
+        f"COPY ({query.select(DataStore.TABLE_NAME)}) TO '{target}' {options}",
+        query.values,
+    ).fetchone()[0]
+    seconds = time.perf_counter() - started_at
+
+    result = ExportResult(path=path, rows=rows, bytes=path.stat().st_size, seconds=seconds)
+    logger.info(
+        f"Exported {rows} rows to {path} in {seconds:.2f}s "
+        f"({result.rows_per_second:,.0f} rows/s, {result.megabytes_per_second:.1f} MB/s)"
+    )
+    return result
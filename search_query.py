@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Collection, Dict, Tuple
+
+from catalog import date_bounds, slider_bounds
+
+# リストベースのフィルタ条件（IN句）の定義
+LIST_FILTERS = {
+    "price_category": "PriceCategory",
+    "type_": "Type",
+    "region": "Region",
+    "municipality": "Municipality",
+    "districtName": "DistrictName",
+    "floor_plan": "FloorPlan",
+    "land_shape": "LandShape",
+    "structure": "Structure",
+    "direction": "Direction",
+    "classification": "Classification",
+    "city_planning": "CityPlanning",
+    "renovation": "Renovation",
+    "remarks": "Remarks",
+}
+
+# 数値レンジ系のフィルタ条件（BETWEEN句）の定義。カタログの範囲全体を選択している場合は絞り込まない
+RANGE_FILTERS = {
+    "trade_price": "TradePrice",
+    "price_per_unit": "PricePerUnit",
+    "area": "Area",
+    "unit_price": "UnitPrice",
+    "frontage": "Frontage",
+    "total_floor_area": "TotalFloorArea",
+    "building_year": "BuildingYear",
+    "breadth": "Breadth",
+    "coverage_ratio": "CoverageRatio",
+    "floor_area_ratio": "FloorAreaRatio",
+}
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """プレースホルダ付きのWHERE句とバインドする値"""
+    where: str
+    values: Tuple[Any, ...]
+    filter_count: int
+
+    def select(self, table: str, columns: str = "*") -> str:
+        """検索結果を取得するSQLを生成"""
+        return f"SELECT {columns} FROM {table} WHERE {self.where}"
+
+
+@lru_cache(maxsize=256)
+def _compile_shape(shape: Tuple[Tuple[str, str, int], ...]) -> str:
+    """フィルタの形（種類・カラム・値の個数）からWHERE句を生成
+
+    同じ形の検索では同じSQL文字列を再利用し、値はすべてバインド変数で渡す。
+    """
+    conditions = []
+    for kind, column, size in shape:
+        if kind == "in":
+            conditions.append(f"{column} IN ({', '.join(['?'] * size)})")
+        elif kind == "between":
+            conditions.append(f"{column} BETWEEN ? AND ?")
+        elif kind == "period":
+            conditions.append(f"{column} >= ? AND {column} < ?")
+    return " AND ".join(conditions) if conditions else "TRUE"
+
+
+def compile_search(params: Dict[str, Any], exclude: Collection[str] = ()) -> CompiledQuery:
+    """render_search_parametersの結果を1つのパラメータ化クエリに変換
+
+    選択肢の並び順や重複、デフォルト値のままのスライダーは結果に影響しないため、
+    同じ検索条件からは常に等しいCompiledQueryが得られる（キャッシュのキーに使用できる）。
+
+    Args:
+        params: 検索パラメータの辞書
+        exclude: 条件に含めないカラム（ファセット集計で自身の選択を除外する場合に使用）
+
+    Returns:
+        CompiledQuery: WHERE句・バインドする値・適用したフィルタ数
+    """
+    shape = []
+    values = []
+
+    for key, column in LIST_FILTERS.items():
+        if column in exclude:
+            continue
+        items = sorted(set(params.get(key) or []))
+        if items:
+            shape.append(("in", column, len(items)))
+            values.extend(items)
+
+    for key, column in RANGE_FILTERS.items():
+        if column in exclude:
+            continue
+        value = params.get(key)
+        if value is not None and tuple(value) != slider_bounds(column):
+            shape.append(("between", column, 2))
+            values.extend(value[:2])
+
+    # 取引時点はPeriodが四半期末の日時のため、終了日の翌日未満で比較する
+    default_period_range = date_bounds("Period")
+    period_range = (
+        params.get("fr_date", default_period_range[0]),
+        params.get("to_date", default_period_range[1]),
+    )
+    if period_range != default_period_range and "Period" not in exclude:
+        shape.append(("period", "Period", 2))
+        values.extend([period_range[0], period_range[1] + timedelta(days=1)])
+
+    return CompiledQuery(
+        where=_compile_shape(tuple(shape)),
+        values=tuple(values),
+        filter_count=len(shape),
+    )
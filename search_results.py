@@ -0,0 +1,207 @@
+from typing import Any, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+import streamlit as st
+
+from data_store import DataStore, get_data_store
+from query_runner import get_query_runner
+from result_cache import get_result_cache
+from result_export import EXPORT_FORMATS, MAX_DOWNLOAD_BYTES, export_path, export_query
+from search_query import CompiledQuery
+
+PAGE_SIZE = 100  # 1ページに表示する件数
+EXPORT_TIMEOUT = 600.0  # エクスポートのタイムアウト（秒）
+
+# 並び替えに使用できるカラム
+SORT_COLUMNS = {
+    "取引時点": "Period",
+    "取引価格": "TradePrice",
+    "面積": "Area",
+    "平方メートル単価": "UnitPrice",
+    "建築年": "BuildingYear",
+    "地区名": "DistrictName",
+}
+
+# ページ境界のキー（直前ページ最終行の並び替えカラムの値, rowid）
+PageKey = Tuple[Any, int]
+
+_ROWID_COLUMN = "__rowid"
+
+
+def count_matches(cursor: duckdb.DuckDBPyConnection, query: CompiledQuery) -> int:
+    """検索条件に一致する件数を取得"""
+    sql = query.select(DataStore.TABLE_NAME, "COUNT(*)")
+    return cursor.execute(sql, query.values).fetchone()[0]
+
+
+def fetch_page(
+    cursor: duckdb.DuckDBPyConnection,
+    query: CompiledQuery,
+    sort_column: str,
+    descending: bool,
+    after: Optional[PageKey],
+    page_size: int = PAGE_SIZE,
+) -> Tuple[pa.Table, Optional[PageKey]]:
+    """キーセット方式で1ページ分の検索結果をArrow形式で取得
+
+    OFFSETを使わず直前ページの最終行より後ろの行だけを読むため、
+    何ページ目でも取得コストは一定になる。並び順は並び替えカラム（NULLは最後）と
+    rowidの組で一意に決める。
+
+    Args:
+        cursor: クエリを実行するカーソル
+        query: コンパイル済みの検索条件
+        sort_column: 並び替えカラム
+        descending: 降順で並び替える場合はTrue
+        after: 直前ページのキー（先頭ページの場合はNone）
+        page_size: 1ページの件数
+
+    Returns:
+        Tuple[pa.Table, Optional[PageKey]]: ページのデータと次ページのキー（最終ページの場合はNone）
+    """
+    conditions = [f"({query.where})"]
+    values = list(query.values)
+    if after is not None:
+        last_value, last_rowid = after
+        if last_value is None:
+            conditions.append(f"{sort_column} IS NULL AND rowid > ?")
+            values.append(last_rowid)
+        else:
+            operator = "<" if descending else ">"
+            conditions.append(
+                f"({sort_column} {operator} ? OR ({sort_column} = ? AND rowid > ?) "
+                f"OR {sort_column} IS NULL)"
+            )
+            values.extend([last_value, last_value, last_rowid])
+
+    direction = "DESC" if descending else "ASC"
+    sql = (
+        f"SELECT *, rowid AS {_ROWID_COLUMN} FROM {DataStore.TABLE_NAME} "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {sort_column} {direction} NULLS LAST, rowid "
+        f"LIMIT {page_size + 1}"
+    )
+    # 次ページの有無を判定するため1件多く取得する
+    table = cursor.execute(sql, values).fetch_record_batch(page_size + 1).read_all()
+
+    next_key = None
+    if table.num_rows > page_size:
+        table = table.slice(0, page_size)
+        next_key = (
+            table.column(sort_column)[page_size - 1].as_py(),
+            table.column(_ROWID_COLUMN)[page_size - 1].as_py(),
+        )
+    return table.select([name for name in table.column_names if name != _ROWID_COLUMN]), next_key
+
+
+def reset_pagination() -> None:
+    """ページ位置を先頭に戻す"""
+    st.session_state.search_page_keys = [None]
+    st.session_state.search_next_key = None
+
+
+def _next_page() -> None:
+    """次のページへ移動"""
+    st.session_state.search_page_keys.append(st.session_state.search_next_key)
+
+
+def _previous_page() -> None:
+    """前のページへ移動"""
+    st.session_state.search_page_keys.pop()
+
+
+def render_search_results(query: CompiledQuery) -> None:
+    """検索結果を件数とページ単位の表で表示"""
+    store = get_data_store()
+    store.refresh()
+    cache = get_result_cache()
+    runner = get_query_runner()
+    if "search_page_keys" not in st.session_state:
+        reset_pagination()
+
+    try:
+        _render_page(store, cache, runner, query)
+    except TimeoutError as e:
+        st.error(f"検索に時間がかかりすぎたため中断しました。条件を絞り込んでください: {e}")
+
+
+def _render_page(store, cache, runner, query: CompiledQuery) -> None:
+    """件数・並び替え・ページの表と移動ボタンを表示"""
+    total = cache.get_or_compute(
+        ("count", query),
+        store.version,
+        lambda: runner.run("search_count", lambda cursor: count_matches(cursor, query)),
+    )
+    st.write(f"フィルタ数: {query.filter_count}")
+    st.write(f"該当件数: {total:,}件")
+
+    col_sort, col_order = st.columns(2)
+    sort_label = col_sort.selectbox(
+        "並び替え", options=list(SORT_COLUMNS), key="search_sort_column", on_change=reset_pagination
+    )
+    descending = col_order.checkbox("降順", key="search_sort_desc", on_change=reset_pagination)
+
+    page_keys = st.session_state.search_page_keys
+    table, next_key = cache.get_or_compute(
+        ("page", query, sort_label, descending, page_keys[-1]),
+        store.version,
+        lambda: runner.run(
+            "search_page",
+            lambda cursor: fetch_page(
+                cursor, query, SORT_COLUMNS[sort_label], descending, page_keys[-1]
+            ),
+        ),
+    )
+    st.session_state.search_next_key = next_key
+
+    st.dataframe(table)
+
+    page_index = len(page_keys) - 1
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    col_prev.button("前のページ", on_click=_previous_page, disabled=page_index == 0)
+    col_page.write(
+        f"{page_index * PAGE_SIZE + min(1, table.num_rows):,} - "
+        f"{page_index * PAGE_SIZE + table.num_rows:,}件目を表示"
+    )
+    col_next.button("次のページ", on_click=_next_page, disabled=next_key is None)
+
+    stats = cache.stats()
+    st.caption(
+        f"結果キャッシュ: ヒット率 {stats['hit_rate']:.0%} "
+        f"（{stats['entries']}件, {stats['bytes'] / 1024 / 1024:.1f}MB）"
+    )
+
+    _render_export(runner, query)
+
+
+def _render_export(runner, query: CompiledQuery) -> None:
+    """検索結果全件をCSV・Parquetに書き出す操作欄を表示"""
+    with st.expander("検索結果をエクスポート"):
+        export_format = st.radio(
+            "出力形式", options=list(EXPORT_FORMATS), horizontal=True, key="search_export_format"
+        )
+        if st.button("エクスポート", key="search_export_button"):
+            # 同じセッションで前回出力したファイルは残さない
+            previous = st.session_state.get("search_export")
+            if previous is not None:
+                previous.path.unlink(missing_ok=True)
+            path = export_path(export_format)
+            st.session_state.search_export = runner.run(
+                "search_export",
+                lambda cursor: export_query(cursor, query, path, export_format),
+                timeout=EXPORT_TIMEOUT,
+            )
+
+        result = st.session_state.get("search_export")
+        if result is None or not result.path.exists():
+            return
+        st.write(
+            f"{result.rows:,}件（{result.bytes / 1024 / 1024:.1f}MB）を{result.seconds:.2f}秒で出力しました"
+            f"（{result.rows_per_second:,.0f}件/秒, {result.megabytes_per_second:.1f}MB/秒）"
+        )
+        if result.bytes <= MAX_DOWNLOAD_BYTES:
+            with open(result.path, "rb") as f:
+                st.download_button("ダウンロード", data=f, file_name=result.path.name)
+        else:
+            st.info(f"ファイルサイズが大きいため、サーバー上のファイルを利用してください: {result.path}")
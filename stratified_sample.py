@@ -0,0 +1,76 @@
+from typing import Optional, Sequence
+
+import duckdb
+
+from data_store import get_data_store
+
+DEFAULT_SEED = 0  # 標本の抽出に使用するシード値
+
+
+def stratified_sample_relation(
+    rel: duckdb.DuckDBPyRelation,
+    strata: Sequence[str],
+    max_rows: int,
+    max_per_stratum: Optional[int] = None,
+    seed: int = DEFAULT_SEED,
+) -> duckdb.DuckDBPyRelation:
+    """層（strataの値の組）ごとに上限件数までを無作為に抽出するrelationを作成
+
+    先頭から件数で打ち切る場合と異なり、すべての層から偏りなく行を選ぶ。
+    層ごとの上限は、各層の件数を上限で打ち切った合計がmax_rowsに収まる最大の値
+    （件数の少ない層の余りを他の層に回す）とし、max_per_stratumを指定した場合はそれ以下にする。
+    層内では行の内容とシード値のハッシュ順に選ぶため、同じデータとシード値からは常に同じ標本が得られる。
+    層の数がmax_rowsを超える場合は、層の値とシード値のハッシュ順に先頭からmax_rows個の層を選び、
+    各層から1件ずつを抽出する。いずれの場合も抽出する行数はmax_rowsを超えない。
+
+    Args:
+        rel: 抽出元のrelation
+        strata: 層を表すカラム
+        max_rows: 抽出する行数の上限
+        max_per_stratum: 1つの層から抽出する行数の上限
+        seed: 抽出に使用するシード値
+
+    Returns:
+        duckdb.DuckDBPyRelation: 抽出した行に、抽出率の逆数（sample_weight。層の件数に対する抽出率と
+            層が選ばれる確率の積の逆数で、重みの合計は抽出元の件数（層を間引いた場合はその推定値）になる）
+            を付与したrelation
+    """
+    partition = ", ".join(strata)
+    per_stratum_limit = f"LEAST(cap, {int(max_per_stratum)})" if max_per_stratum else "cap"
+    sql = f"""
+        WITH src AS ({rel.sql_query()}),
+        sizes AS (
+            SELECT COUNT(*) AS size FROM src GROUP BY {partition}
+        ),
+        fair_shares AS (
+            -- 件数の少ない層から順に、残りの行数を残りの層で等分した値
+            SELECT size, ROW_NUMBER() OVER (ORDER BY size) AS position,
+                ({int(max_rows)} - (SUM(size) OVER (ORDER BY size ROWS UNBOUNDED PRECEDING) - size))
+                    / (COUNT(*) OVER () - ROW_NUMBER() OVER (ORDER BY size) + 1) AS fair_share
+            FROM sizes
+        ),
+        caps AS (
+            SELECT GREATEST(1, COALESCE(
+                floor(arg_min(fair_share, position) FILTER (WHERE size >= fair_share)),
+                MAX(size)
+            ))::BIGINT AS cap
+            FROM fair_shares
+        ),
+        strata_count AS (
+            SELECT COUNT(*) AS strata FROM sizes
+        ),
+        ranked AS (
+            SELECT src.*,
+                ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY hash(src, {int(seed)})) AS sample_rank,
+                COUNT(*) OVER (PARTITION BY {partition}) AS stratum_size,
+                -- 層の数がmax_rowsを超える場合に抽出する層を決める順序
+                DENSE_RANK() OVER (ORDER BY hash({partition}, {int(seed)}), {partition}) AS stratum_rank
+            FROM src
+        )
+        SELECT ranked.* EXCLUDE (sample_rank, stratum_size, stratum_rank),
+            stratum_size / LEAST(stratum_size, {per_stratum_limit})
+                * strata / LEAST(strata, {int(max_rows)}) AS sample_weight
+        FROM ranked, caps, strata_count
+        WHERE sample_rank <= {per_stratum_limit} AND stratum_rank <= {int(max_rows)}
+    """
+    return get_data_store().cursor().sql(sql)
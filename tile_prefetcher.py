@@ -0,0 +1,63 @@
+import logging
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from api_scheduler import Priority
+from real_estate_data_processor import GeoJsonDownloader
+
+logger = logging.getLogger(__name__)
+
+
+class TilePrefetcher:
+    """クリック地点周辺のタイルをバックグラウンドでキャッシュに先読みするクラス"""
+
+    def __init__(self, downloader: GeoJsonDownloader):
+        self.downloader = downloader
+        self._futures: List[Future] = []
+        self._key: Optional[Tuple[int, int, int, int, int]] = None
+
+    @staticmethod
+    def neighbour_tiles(x: int, y: int) -> List[Tuple[int, int]]:
+        """中心タイルと周囲8タイルを中心から順に取得"""
+        return [(x, y)] + [
+            (x + dx, y + dy)
+            for dy in (-1, 0, 1)
+            for dx in (-1, 0, 1)
+            if (dx, dy) != (0, 0)
+        ]
+
+    def start(self, lat: float, lon: float, zoom: int, from_date: int, to_date: int) -> None:
+        """先読みを開始（実行中の先読みはキャンセル）"""
+        x, y = self.downloader.latlon_to_tile(lat, lon, zoom)
+        key = (x, y, zoom, int(from_date), int(to_date))
+        if key == self._key and self.is_running():
+            return
+
+        self.cancel()
+        self._key = key
+        # キャッシュ済みのタイルはAPIのリクエスト枠を使わないよう投入しない
+        self._futures = [
+            self.downloader.scheduler.submit(
+                Priority.PREFETCH, self._prefetch_tile, tx, ty, zoom, int(from_date), int(to_date)
+            )
+            for tx, ty in self.neighbour_tiles(x, y)
+            if self.downloader.cache.get(tx, ty, zoom, int(from_date), int(to_date)) is None
+        ]
+
+    def cancel(self) -> None:
+        """未実行の先読みをキャンセル"""
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._key = None
+
+    def is_running(self) -> bool:
+        """先読みが実行中かどうか"""
+        return any(not future.done() for future in self._futures)
+
+    def _prefetch_tile(self, x: int, y: int, zoom: int, from_date: int, to_date: int) -> None:
+        """ワーカースレッドでタイルを取得してキャッシュへ保存"""
+        try:
+            self.downloader.fetch_tile_geojson(x, y, zoom, from_date=from_date, to_date=to_date)
+        except Exception as e:
+            logger.warning(f"Prefetch failed for tile x={x}, y={y}, zoom={zoom}: {e}")
@@ -0,0 +1,279 @@
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+SKETCH_RELATIVE_ERROR = 0.01  # 分位点の相対誤差の上限
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ERROR) / (1 - SKETCH_RELATIVE_ERROR)  # 隣り合うビンの境界の比
+SUMMARY_QUANTILES = {"q1": 0.25, "median": 0.5, "q3": 0.75}
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """集計の時間解像度"""
+    label: str  # 表示名
+    table: str  # 集計テーブル名
+    start_sql: str  # 四半期の開始日（PeriodStart）から期間の開始日を求める式
+    label_sql: str  # 期間の開始日（PeriodStart）から期間のラベルを求める式
+
+
+# 時間解像度の定義（先頭の四半期から順に、前の解像度の集計を併合して作成する）
+RESOLUTIONS = {
+    "quarter": Resolution(
+        label="四半期",
+        table="rollup_quarter",
+        start_sql="PeriodStart",
+        label_sql="year(PeriodStart) || 'Q' || quarter(PeriodStart)",
+    ),
+    "half_year": Resolution(
+        label="半期",
+        table="rollup_half_year",
+        start_sql="make_date(year(PeriodStart), CASE WHEN month(PeriodStart) <= 6 THEN 1 ELSE 7 END, 1)",
+        label_sql="year(PeriodStart) || 'H' || CASE WHEN month(PeriodStart) <= 6 THEN 1 ELSE 2 END",
+    ),
+    "year": Resolution(
+        label="年",
+        table="rollup_year",
+        start_sql="make_date(year(PeriodStart), 1, 1)",
+        label_sql="year(PeriodStart)::VARCHAR",
+    ),
+}
+ROLLUP_TABLES = [resolution.table for resolution in RESOLUTIONS.values()]
+
+
+def _in_dates_sql(expression: str, dates: Iterable[str]) -> str:
+    """式の値が日付の一覧に含まれるかどうかの条件（一覧が空の場合は常に偽）"""
+    values = [f"DATE '{date}'" for date in sorted(dates)]
+    return f"{expression} IN ({', '.join(values)})" if values else "false"
+
+
+def _quarter_rollup_sql(quarters: Optional[Iterable[str]] = None) -> str:
+    """used_mansionsから四半期ごとの集計を作成するSQL（quartersを指定した場合はその四半期のみ）
+
+    TradePricePerAreaはlog(値)/log(SKETCH_GAMMA)の切り上げをビン番号とするヒストグラム（スケッチ）に
+    まとめる。スケッチはビンごとの件数を足し合わせるだけで併合できるため、粗い解像度は
+    四半期の集計から作成できる。
+    すべての取引の集計（OutliersExcluded=false）と、外れ値（IsOutlier）を除いた集計
+    （OutliersExcluded=true）を両方作成する。
+    """
+    quarter_start = "date_trunc('quarter', Period)::DATE"
+    condition = f"AND {_in_dates_sql(quarter_start, quarters)}" if quarters is not None else ""
+    quarter = RESOLUTIONS["quarter"]
+    return f"""
+        WITH entries AS (
+            SELECT
+                CASE WHEN GROUPING(DistrictName) = 1 THEN 'municipality' ELSE 'district' END AS Level,
+                OutliersExcluded, Municipality, DistrictName, PeriodStart, bucket,
+                COUNT(*) AS count,
+                SUM(TradePricePerArea) AS total
+            FROM (
+                SELECT Municipality, DistrictName, TradePricePerArea, IsOutlier,
+                    date_trunc('quarter', Period)::DATE AS PeriodStart,
+                    ceil(ln(TradePricePerArea) / ln({SKETCH_GAMMA}))::INTEGER AS bucket
+                FROM used_mansions
+                WHERE TradePricePerArea > 0 AND Period IS NOT NULL {condition}
+            ), (VALUES (false), (true)) AS variants(OutliersExcluded)
+            WHERE NOT (OutliersExcluded AND IsOutlier)
+            GROUP BY GROUPING SETS (
+                (OutliersExcluded, Municipality, DistrictName, PeriodStart, bucket),
+                (OutliersExcluded, Municipality, PeriodStart, bucket)
+            )
+        )
+        SELECT Level, OutliersExcluded, Municipality, DistrictName, PeriodStart,
+            {quarter.label_sql} AS PeriodLabel,
+            SUM(count)::BIGINT AS count,
+            SUM(total) AS sum_price_per_area,
+            list({{'bucket': bucket, 'count': count}} ORDER BY bucket) AS sketch
+        FROM entries
+        GROUP BY Level, OutliersExcluded, Municipality, DistrictName, PeriodStart
+    """
+
+
+def _merged_rollup_sql(source: str, resolution: Resolution, periods: Optional[Iterable[str]] = None) -> str:
+    """四半期の集計を併合して粗い解像度の集計を作成するSQL（periodsを指定した場合はその期間のみ）"""
+    condition = (
+        f"WHERE {_in_dates_sql(resolution.start_sql, periods)}" if periods is not None else ""
+    )
+    return f"""
+        WITH merged AS (
+            SELECT Level, OutliersExcluded, Municipality, DistrictName, {resolution.start_sql} AS PeriodStart,
+                SUM(count)::BIGINT AS count,
+                SUM(sum_price_per_area) AS sum_price_per_area,
+                flatten(list(sketch)) AS entries
+            FROM {source}
+            {condition}
+            GROUP BY ALL
+        )
+        SELECT Level, OutliersExcluded, Municipality, DistrictName, PeriodStart,
+            {resolution.label_sql} AS PeriodLabel,
+            count, sum_price_per_area,
+            (
+                SELECT list({{'bucket': bucket, 'count': count}} ORDER BY bucket)
+                FROM (
+                    SELECT entry.bucket AS bucket, SUM(entry.count)::BIGINT AS count
+                    FROM (SELECT unnest(entries) AS entry)
+                    GROUP BY entry.bucket
+                )
+            ) AS sketch
+        FROM merged
+    """
+
+
+def rollup_definitions() -> Dict[str, str]:
+    """集計テーブルごとの定義（全件から作成する場合のSQL）"""
+    quarter_table = RESOLUTIONS["quarter"].table
+    return {
+        resolution.table: _with_quantiles_sql(
+            _quarter_rollup_sql()
+            if resolution.table == quarter_table
+            else _merged_rollup_sql(quarter_table, resolution)
+        )
+        for resolution in RESOLUTIONS.values()
+    }
+
+
+def quarter_fingerprints(connection: duckdb.DuckDBPyConnection) -> Dict[str, str]:
+    """used_mansionsの四半期ごとの内容を表す値（件数と行のハッシュ値の合計）を取得"""
+    rows = connection.execute("""
+        SELECT date_trunc('quarter', Period)::DATE::VARCHAR,
+            COUNT(*) || ':' || SUM(hash(used_mansions)::HUGEINT)
+        FROM used_mansions
+        WHERE Period IS NOT NULL
+        GROUP BY ALL
+    """).fetchall()
+    return dict(rows)
+
+
+def _period_starts(
+    connection: duckdb.DuckDBPyConnection, resolution: Resolution, quarters: Iterable[str]
+) -> list:
+    """四半期の開始日の一覧から、それらを含む期間の開始日の一覧を取得"""
+    rows = connection.execute(
+        f"SELECT DISTINCT ({resolution.start_sql})::VARCHAR "
+        f"FROM (SELECT unnest(?::DATE[]) AS PeriodStart)",
+        [sorted(quarters)],
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def update_rollups(
+    connection: duckdb.DuckDBPyConnection,
+    output_dir: Path,
+    previous_fingerprints: Optional[Dict[str, str]] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """used_mansionsテーブルから時間解像度ごとの集計を作成・更新してParquetに保存
+
+    前回の集計と、そのときの四半期ごとの内容を表す値（quarter_fingerprints）が渡された場合は、
+    値が変わった四半期（追加・削除・修正された四半期）だけを集計し直し、それ以外は前回の結果を使う。
+    粗い解像度は、集計し直した四半期を含む期間だけを四半期の集計から併合し直す。
+
+    Args:
+        connection: used_mansionsテーブルを持つ接続
+        output_dir: 集計を保存するディレクトリ
+        previous_fingerprints: 前回の集計を作成したときの四半期ごとの内容を表す値
+            （Noneの場合はすべての四半期を集計する）
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]: 集計テーブルごとのファイル名・行数と、
+            今回の四半期ごとの内容を表す値
+    """
+    paths = {table: output_dir / f"{table}.parquet" for table in ROLLUP_TABLES}
+    fingerprints = quarter_fingerprints(connection)
+    changed_quarters = None
+    if previous_fingerprints is not None and all(path.exists() for path in paths.values()):
+        for table, path in paths.items():
+            connection.execute(
+                f"CREATE TABLE previous_{table} AS SELECT * FROM read_parquet('{path.as_posix()}')"
+            )
+        changed_quarters = [
+            quarter
+            for quarter in set(fingerprints) | set(previous_fingerprints)
+            if fingerprints.get(quarter) != previous_fingerprints.get(quarter)
+        ]
+
+    quarter_table = RESOLUTIONS["quarter"].table
+    tables = {}
+    for resolution in RESOLUTIONS.values():
+        periods = None
+        if changed_quarters is not None:
+            periods = (
+                changed_quarters
+                if resolution.table == quarter_table
+                else _period_starts(connection, resolution, changed_quarters)
+            )
+        if resolution.table == quarter_table:
+            sql = _with_quantiles_sql(_quarter_rollup_sql(periods))
+        else:
+            sql = _with_quantiles_sql(_merged_rollup_sql(quarter_table, resolution, periods))
+        if periods is not None:
+            sql = (
+                f"SELECT * FROM previous_{resolution.table} "
+                f"WHERE NOT {_in_dates_sql('PeriodStart', periods)} "
+                f"UNION ALL BY NAME ({sql})"
+            )
+        connection.execute(f"CREATE TABLE {resolution.table} AS {sql}")
+        path = paths[resolution.table]
+        # 作成方法によらず同じ内容のファイルになるよう、行を並べ替えて保存する
+        connection.execute(
+            f"COPY (SELECT * FROM {resolution.table} "
+            f"ORDER BY Level, OutliersExcluded, Municipality, DistrictName, PeriodStart) "
+            f"TO '{path.as_posix()}' (FORMAT PARQUET)"
+        )
+        rows = connection.execute(f"SELECT COUNT(*) FROM {resolution.table}").fetchone()[0]
+        tables[resolution.table] = {"file": path.name, "rows": rows}
+
+    if changed_quarters is not None:
+        logger.info(f"Rollups updated for {len(changed_quarters)} changed quarters")
+    else:
+        logger.info("Rollups rebuilt from all quarters")
+    return tables, fingerprints
+
+
+def _with_quantiles_sql(source_sql: str) -> str:
+    """集計の各行にスケッチから求めた平均と分位点（q1・median・q3）を追加するSQLを生成
+
+    分位点はスケッチのビンの代表値で、真の値との相対誤差はSKETCH_RELATIVE_ERROR以内。
+    """
+    # 分位点を含むビン（累積件数が初めて順位に達するビン）の代表値
+    quantiles = ",\n            ".join(
+        f"2 * pow({SKETCH_GAMMA}, MIN(bucket) FILTER (WHERE cumulative_count >= {q} * count))"
+        f" / ({SKETCH_GAMMA} + 1) AS {name}"
+        for name, q in SUMMARY_QUANTILES.items()
+    )
+    return f"""
+        WITH rollup AS (
+            SELECT ROW_NUMBER() OVER () AS __row, * FROM ({source_sql})
+        ),
+        cumulative AS (
+            SELECT __row, count, entry.bucket AS bucket,
+                SUM(entry.count) OVER (PARTITION BY __row ORDER BY entry.bucket) AS cumulative_count
+            FROM (SELECT __row, count, unnest(sketch) AS entry FROM rollup)
+        ),
+        quantiles AS (
+            SELECT __row,
+            {quantiles}
+            FROM cumulative
+            GROUP BY __row, count
+        )
+        SELECT rollup.* EXCLUDE (__row),
+            sum_price_per_area / count AS mean_price_per_area,
+            quantiles.* EXCLUDE (__row)
+        FROM rollup JOIN quantiles USING (__row)
+    """
+
+
+def rollup_summary_relation(resolution: str) -> duckdb.DuckDBPyRelation:
+    """時間解像度の集計テーブルから件数・平均・分位点のrelationを作成（実行はしない）
+
+    Returns:
+        duckdb.DuckDBPyRelation: Level, OutliersExcluded, Municipality, DistrictName, PeriodStart,
+            PeriodLabel, count, sum_price_per_area, mean_price_per_area, q1, median, q3 を持つrelation
+    """
+    from data_store import get_data_store
+
+    table = RESOLUTIONS[resolution].table
+    return get_data_store().cursor().sql(f"SELECT * EXCLUDE (sketch) FROM {table}")